@@ -0,0 +1,68 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2021 Cong Vo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+Provided license texts might have their own copyrights and restrictions
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Benchmark the checkout this file belongs to, not an installed mipkit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mipkit.images import batched_nms, match_bboxes, nms, soft_nms
+from synthetic import random_detections
+
+NUM_BOXES = 10000
+NUM_CLASSES = 20
+NUM_REPEATS = 5
+
+
+def benchmark(name, func, num_boxes):
+    func()
+    start_time = time.perf_counter()
+    for _ in range(NUM_REPEATS):
+        out = func()
+    elapsed = (time.perf_counter() - start_time) / NUM_REPEATS
+    print(f"{name:<20} {elapsed * 1000:9.2f} ms  {num_boxes / elapsed:12.0f} boxes/s")
+    return out
+
+
+if __name__ == "__main__":
+    bboxes, scores, class_ids = random_detections(NUM_BOXES, NUM_CLASSES)
+    print(f"{NUM_BOXES} boxes, {NUM_CLASSES} classes")
+
+    keep = benchmark("nms", lambda: nms(bboxes, scores, 0.5), NUM_BOXES)
+    benchmark("batched_nms", lambda: batched_nms(bboxes, scores, class_ids, 0.5), NUM_BOXES)
+    benchmark("soft_nms (gaussian)", lambda: soft_nms(bboxes, scores), NUM_BOXES)
+
+    targets = bboxes[keep]
+    predictions = targets + np.random.default_rng(1).normal(0, 4, targets.shape)
+    benchmark("match (greedy)", lambda: match_bboxes(predictions, targets), len(keep))
+    benchmark(
+        "match (hungarian)",
+        lambda: match_bboxes(predictions, targets, method="hungarian"),
+        len(keep),
+    )
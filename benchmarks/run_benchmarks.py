@@ -0,0 +1,361 @@
+"""Micro-benchmarks of mipkit hot paths on synthetic data (offline, CPU only)
+
+Usage:
+    python benchmarks/run_benchmarks.py run -o base.json
+    python benchmarks/run_benchmarks.py run -o new.json -k images
+    python benchmarks/run_benchmarks.py compare base.json new.json --threshold 0.1
+
+`compare` exits with status 1 when a benchmark got slower than the threshold.
+Benchmarks whose optional dependencies are missing are reported as skipped.
+
+The MIT License (MIT)
+Copyright (c) 2021 Cong Vo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+Provided license texts might have their own copyrights and restrictions
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Benchmark the checkout this file belongs to, not an installed mipkit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+
+BENCHMARKS = {}
+
+
+def register(name):
+    """Register a setup function returning (func, num_items); `func` is timed"""
+
+    def register_decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register_decorator
+
+
+# ===============================================================================
+# Benchmarks
+# ===============================================================================
+
+
+@register("images.combine_images")
+def bench_combine_images():
+    from mipkit.images import combine_images
+
+    images = synthetic.random_images(16, 256, 256)
+    return lambda: combine_images(images, axis=1), len(images)
+
+
+@register("images.compute_iou_matrix")
+def bench_iou_matrix():
+    from mipkit.images import compute_iou_matrix
+
+    bboxes, _ = synthetic.random_bboxes(1000)
+    return lambda: compute_iou_matrix(bboxes, bboxes), len(bboxes) ** 2
+
+
+@register("images.bbox_transforms")
+def bench_bbox_transforms():
+    from mipkit.images import clip_bboxes, convert_bboxes_format, expand_bboxes
+
+    bboxes, _ = synthetic.random_bboxes(100000)
+
+    def func():
+        out = expand_bboxes((1920, 1920), bboxes, 1.1)
+        out = clip_bboxes(out, (1920, 1920))
+        return convert_bboxes_format(out, "default", "cxcywh")
+
+    return func, len(bboxes)
+
+
+@register("images.nms")
+def bench_nms():
+    from mipkit.images import nms
+
+    bboxes, scores = synthetic.random_bboxes(10000)
+    return lambda: nms(bboxes, scores, 0.5), len(bboxes)
+
+
+@register("video.get_frames_by_FPS")
+def bench_get_frames_by_fps():
+    import cv2
+
+    from mipkit.video import get_frames_by_FPS
+
+    path = os.path.join(synthetic.cache_dir(), "video_300f.avi")
+    if not os.path.isfile(path):
+        synthetic.write_video(path, num_frames=300)
+
+    def func():
+        cap = cv2.VideoCapture(path)
+        try:
+            return get_frames_by_FPS(cap, fps=5)
+        finally:
+            cap.release()
+
+    return func, 300
+
+
+@register("audio.wav2mel")
+def bench_wav2mel():
+    from mipkit.audio import wav2mel
+
+    wav, sr = synthetic.random_waveform(10.0)
+    return lambda: wav2mel(wav, sr), len(wav)
+
+
+@register("ip.fft")
+def bench_fft():
+    from mipkit.ip.fft import fft
+
+    img = synthetic.random_images(1, 512, 512, 1)[0][..., 0]
+    return lambda: fft(img), img.size
+
+
+@register("text_cleaner.clean")
+def bench_clean():
+    from mipkit.nlp.text_cleaner import clean
+
+    texts = synthetic.random_texts(200)
+
+    def func():
+        return [clean(t, no_urls=True, no_emails=True, no_numbers=True) for t in texts]
+
+    return func, len(texts)
+
+
+@register("mprocess.pool_worker")
+def bench_pool_worker():
+    from mipkit.mprocess import pool_worker
+
+    inputs = list(range(2000))
+    return lambda: pool_worker(synthetic.square, inputs, num_worker=2, verbose=False), len(inputs)
+
+
+@register("mprocess.pool_worker_thread")
+def bench_pool_worker_thread():
+    from mipkit.mprocess import pool_worker
+
+    inputs = list(range(2000))
+
+    def func():
+        return pool_worker(synthetic.square, inputs, use_thread=True, num_worker=4, verbose=False)
+
+    return func, len(inputs)
+
+
+@register("dl.summary")
+def bench_summary():
+    import contextlib
+    import io
+
+    import torch
+    import torch.nn as nn
+
+    from mipkit.dl import summary
+
+    model = nn.Sequential(
+        nn.Conv2d(3, 16, 3, padding=1),
+        nn.ReLU(),
+        nn.Conv2d(16, 32, 3, padding=1),
+        nn.ReLU(),
+        nn.AdaptiveAvgPool2d(1),
+        nn.Flatten(),
+        nn.Linear(32, 10),
+    )
+
+    def func():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return summary(model, [(3, 64, 64)], device=torch.device("cpu"))
+
+    return func, 1
+
+
+@register("utils.to_categorical")
+def bench_to_categorical():
+    from mipkit.utils import to_categorical
+
+    labels = synthetic.random_labels(100000, 1000)
+    return lambda: to_categorical(labels, 1000), len(labels)
+
+
+# ===============================================================================
+# Runner
+# ===============================================================================
+
+
+def time_benchmark(func, repeat=5, min_time=0.05):
+    """Time `func` like `timeit`: calls per round grow until a round lasts `min_time`"""
+    func()
+    number = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time or number >= 2**20:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start_time) / number)
+    return timings, number
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(names, repeat=5, min_time=0.05, verbose=True):
+    results = {}
+    for name in names:
+        try:
+            func, num_items = BENCHMARKS[name]()
+        except ImportError as e:
+            # only a missing optional dependency skips a benchmark, not a broken mipkit
+            if e.name is None or e.name.split(".")[0] == "mipkit":
+                raise
+            results[name] = {"status": "skipped", "reason": str(e)}
+            if verbose:
+                print(f"{name:<32} skipped ({e})")
+            continue
+        timings, number = time_benchmark(func, repeat, min_time)
+        median = statistics.median(timings)
+        results[name] = {
+            "status": "ok",
+            "median_ms": median * 1e3,
+            "min_ms": min(timings) * 1e3,
+            "mean_ms": statistics.mean(timings) * 1e3,
+            "stdev_ms": statistics.stdev(timings) * 1e3 if len(timings) > 1 else 0.0,
+            "repeat": repeat,
+            "number": number,
+            "items_per_s": num_items / median,
+        }
+        if verbose:
+            r = results[name]
+            print(
+                f"{name:<32} {r['median_ms']:10.3f} ms  (min {r['min_ms']:.3f}, "
+                f"stdev {r['stdev_ms']:.3f})  {r['items_per_s']:14.0f} items/s"
+            )
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(base, new, threshold=0.1):
+    """Compare the medians of two runs
+
+    Returns:
+        list: (name, base ms, new ms, ratio, flag) rows; flag is "REGRESSION" when
+            new is slower than base by more than `threshold`, "faster" when faster by
+            more than `threshold`, "" otherwise
+    """
+    rows = []
+    for name, new_result in new["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None or base_result["status"] != "ok" or new_result["status"] != "ok":
+            continue
+        ratio = new_result["median_ms"] / base_result["median_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            flag = "faster"
+        rows.append((name, base_result["median_ms"], new_result["median_ms"], ratio, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mipkit micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", help="JSON file to write the results to")
+    run_parser.add_argument("-k", "--filter", default="", help="only names containing this")
+    run_parser.add_argument("-r", "--repeat", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    run_parser.add_argument("-l", "--list", action="store_true", help="list the benchmarks")
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        names = [name for name in BENCHMARKS if args.filter in name]
+        if args.list:
+            print("\n".join(names))
+            return 0
+        report = run(names, args.repeat, args.min_time)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print("Saved results to", args.output)
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare(base, new, args.threshold)
+    print(f"{'name':<32}{'base (ms)':>12}{'new (ms)':>12}{'ratio':>8}")
+    for name, base_ms, new_ms, ratio, flag in rows:
+        print(f"{name:<32}{base_ms:12.3f}{new_ms:12.3f}{ratio:8.2f}  {flag}")
+    regressions = [row[0] for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(
+            f"{len(regressions)} regression(s) above {args.threshold:.0%}:", ", ".join(regressions)
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
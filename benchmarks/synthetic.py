@@ -0,0 +1,114 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2021 Cong Vo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+Provided license texts might have their own copyrights and restrictions
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_SEED = 0
+
+
+def random_images(num_images, height=256, width=256, channels=3, seed=DEFAULT_SEED):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(0, 256, (height, width, channels), dtype=np.uint8) for _ in range(num_images)
+    ]
+
+
+def random_detections(num_boxes, num_classes=1, img_size=1920, seed=DEFAULT_SEED):
+    """Boxes jittered around a few hundred objects, as a detector head would output
+
+    Returns:
+        tuple: (N, 4) bboxes, (N,) scores and (N,) class ids shared by the boxes of
+            an object
+    """
+    rng = np.random.default_rng(seed)
+    num_objects = max(1, num_boxes // 30)
+    centers = rng.uniform(0, img_size, (num_objects, 2))
+    sizes = rng.uniform(20, 200, (num_objects, 2))
+    owner = rng.integers(0, num_objects, num_boxes)
+    cxcy = centers[owner] + rng.normal(0, 8, (num_boxes, 2))
+    wh = sizes[owner] * rng.uniform(0.8, 1.2, (num_boxes, 2))
+    bboxes = np.concatenate([cxcy - wh / 2, cxcy + wh / 2], axis=1)
+    scores = rng.uniform(0, 1, num_boxes)
+    class_ids = rng.integers(0, num_classes, num_objects)[owner]
+    return bboxes, scores, class_ids
+
+
+def random_bboxes(num_boxes, img_size=1920, seed=DEFAULT_SEED):
+    bboxes, scores, _ = random_detections(num_boxes, img_size=img_size, seed=seed)
+    return bboxes, scores
+
+
+def random_waveform(duration=10.0, sr=16000, seed=DEFAULT_SEED):
+    # A few harmonics plus noise, so the spectrogram is not flat
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    freqs = rng.uniform(100, 2000, 5)
+    wav = sum(np.sin(2 * np.pi * f * t) for f in freqs) / len(freqs)
+    wav += rng.normal(0, 0.05, len(t))
+    return wav.astype(np.float32), sr
+
+
+def write_video(path, num_frames=300, height=240, width=320, fps=30, seed=DEFAULT_SEED):
+    """Write a synthetic MJPG video (moving gradient plus noise) to `path`"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    base = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+    for i in range(num_frames):
+        frame = np.roll(base, i * 4, axis=1)[..., None] + rng.normal(0, 10, (height, width, 3))
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+    return path
+
+
+_WORDS = (
+    "the model was trained on 1,024 images and reached 93.5% accuracy , see "
+    "https://example.com/results or mail <b>team@example.com</b> for “details” — café "
+    "naïve résumé LOSS   dropped   quickly\n\nnext epoch"
+).split(" ")
+
+
+def random_texts(num_texts, num_words=60, seed=DEFAULT_SEED):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(_WORDS, num_words)) for _ in range(num_texts)]
+
+
+def random_labels(num_labels, num_classes=1000, seed=DEFAULT_SEED):
+    return np.random.default_rng(seed).integers(0, num_classes, num_labels)
+
+
+def square(x):
+    # Top-level so that process pools can pickle it
+    return x * x
+
+
+def cache_dir():
+    path = os.path.join(tempfile.gettempdir(), "mipkit-benchmarks")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -23,10 +23,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-from . import audio, downloaders, fmt, images, logger, mprocess, pytorch, stats, utils, video, vis
+from . import (audio, downloaders, fmt, images, logger, mprocess, profiling, pytorch, stats,
+               utils, video, vis)
 from .debug import set_trace, Debugger, run_async_func
 
 __all__ = ['audio', 'downloaders', 'fmt', 'images', 'logger', 
-           'mprocess', 'pytorch', 'stats', 
+           'mprocess', 'profiling', 'pytorch', 'stats', 
            'utils', 'video', 'vis', 
            'set_trace', 'Debugger', 'run_async_func']
@@ -23,14 +23,28 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import json
+import os
 import warnings
+from functools import lru_cache, partial
 from typing import TYPE_CHECKING
 
+try:
+    import cv2
+    import numpy as np
+except ImportError as e:
+    warnings.warn(e.msg)
+
+try:
+    from scipy.fft import rfft
+except ImportError:
+    # numpy's FFT is slower, notably on float32, but always available
+    from numpy.fft import rfft
+
+from .mprocess import pool_worker
+
 if TYPE_CHECKING:
     import librosa
-    import numpy as np
-    import pylab
-    from matplotlib import cm
 
 # try:
 #     import librosa
@@ -42,6 +56,8 @@ if TYPE_CHECKING:
 
 
 def load_file(fp, sr=None):
+    import librosa
+
     X, sr = librosa.load(fp, sr=sr)
     return X, sr
 
@@ -70,37 +86,560 @@ N_MELS = 96
 N_MFCC = 40
 
 
-def wav2mfcc(wav_arr, sr, n_mfcc=N_FFT, **args):
+def wav2mfcc(wav_arr, sr, n_mfcc=N_MFCC, **args):
+    import librosa
+
     mfcc = librosa.feature.mfcc(y=wav_arr, sr=sr, S=None, n_mfcc=n_mfcc, **args)
     return mfcc
 
 
-def save_mfcc(mel, path_to_save):
-    # Plotting the spectrogram and save as JPG without axes (just the image)
-    # pylab.figure(figsize=(3, 3))
-    pylab.axis("off")
-    pylab.axes([0.0, 0.0, 1.0, 1.0], frameon=False, xticks=[], yticks=[])  # Remove the white edge
-    librosa.display.specshow(mel, cmap=cm.jet)
-    pylab.savefig(path_to_save, bbox_inches=None, pad_inches=0)
-    pylab.close()
+def save_mfcc(mel, path_to_save, size=(640, 480)):
+    # Save the spectrogram as an image without axes, the size of the former
+    # default pylab figure (6.4 x 4.8 in at 100 dpi)
+    return save_spectrogram(mel, path_to_save, cmap="jet", size=size)
 
 
 def wav2mel(wav_arr, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+    import librosa
+
     S = librosa.feature.melspectrogram(
-        wav_arr, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels
+        y=wav_arr, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels
     )
     log_S = librosa.power_to_db(S, ref=np.max)
     return log_S
 
 
-def save_mel(mel, path_to_save):
-    # Plotting the spectrogram and save as JPG without axes (just the image)
-    # pylab.figure(figsize=(3, 3))
-    pylab.axis("off")
-    pylab.axes([0.0, 0.0, 1.0, 1.0], frameon=False, xticks=[], yticks=[])  # Remove the white edge
-    librosa.display.specshow(mel, cmap=cm.jet)
-    pylab.savefig(path_to_save, bbox_inches=None, pad_inches=0)
-    pylab.close()
+def save_mel(mel, path_to_save, size=(640, 480)):
+    # Save the spectrogram as an image without axes, the size of the former
+    # default pylab figure (6.4 x 4.8 in at 100 dpi)
+    return save_spectrogram(mel, path_to_save, cmap="jet", size=size)
+
+
+# ===============================================================================
+# Batched features
+# ===============================================================================
+# NumPy re-implementation of the librosa defaults used by `wav2mel` and
+# `wav2mfcc` (centered, zero-padded STFT with a periodic Hann window, Slaney
+# mel filterbank, orthonormal DCT-II), vectorized over a batch of waveforms.
+
+
+def _hz_to_mel(freqs):
+    # Slaney scale: linear below 1 kHz, logarithmic above
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    freqs = np.asarray(freqs, dtype=np.float64)
+    log_mels = min_log_mel + np.log(np.maximum(freqs, min_log_hz) / min_log_hz) / logstep
+    return np.where(freqs >= min_log_hz, log_mels, freqs / f_sp)
+
+
+def _mel_to_hz(mels):
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    mels = np.asarray(mels, dtype=np.float64)
+    log_freqs = min_log_hz * np.exp(logstep * (np.maximum(mels, min_log_mel) - min_log_mel))
+    return np.where(mels >= min_log_mel, log_freqs, f_sp * mels)
+
+
+def _readonly(arr):
+    arr.setflags(write=False)
+    return arr
+
+
+@lru_cache(maxsize=None)
+def get_mel_filterbank(sr, n_fft=N_FFT, n_mels=N_MELS):
+    """Slaney-normalized mel filterbank, cached per configuration
+
+    Returns:
+        ndarray: read-only (n_mels, 1 + n_fft // 2) float32 weights, same as `librosa.filters.mel`
+    """
+    fftfreqs = np.fft.rfftfreq(n=n_fft, d=1.0 / sr)
+    mel_f = _mel_to_hz(np.linspace(_hz_to_mel(0.0), _hz_to_mel(sr / 2.0), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fftfreqs)
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:] - mel_f[:-2]))[:, None]
+    return _readonly(weights.astype(np.float32))
+
+
+@lru_cache(maxsize=None)
+def get_window(n_fft=N_FFT):
+    """Periodic Hann window, cached per size"""
+    return _readonly(0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft))
+
+
+@lru_cache(maxsize=None)
+def get_dct_matrix(n_mels=N_MELS, n_mfcc=N_MFCC):
+    """Orthonormal DCT-II basis restricted to the first `n_mfcc` coefficients
+
+    Returns:
+        ndarray: read-only (n_mfcc, n_mels) float64 matrix
+    """
+    k = np.arange(n_mfcc)[:, None]
+    n = np.arange(n_mels)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return _readonly(basis)
+
+
+def pad_waveforms(wavs, dtype=np.float32):
+    """Stack waveforms of different lengths into a zero-padded (B, T) array
+
+    Returns:
+        tuple: padded waveforms, (B,) lengths
+    """
+    lengths = np.array([len(wav) for wav in wavs], dtype=np.int64)
+    padded = np.zeros((len(wavs), lengths.max(initial=0)), dtype=dtype)
+    for i, wav in enumerate(wavs):
+        padded[i, : len(wav)] = wav
+    return padded, lengths
+
+
+def batch_stft_power(wavs, n_fft=N_FFT, hop_length=HOP_LENGTH, center=True):
+    """Power spectrogram of a (B, T) batch of waveforms
+
+    Returns:
+        ndarray: (B, 1 + n_fft // 2, frames) float32 power, with
+            1 + T // hop_length frames when `center` and 1 + (T - n_fft) // hop_length otherwise
+    """
+    wavs = np.asarray(wavs, dtype=np.float32)
+    if center:
+        wavs = np.pad(wavs, ((0, 0), (n_fft // 2, n_fft // 2)))
+    frames = np.lib.stride_tricks.sliding_window_view(wavs, n_fft, axis=-1)[:, ::hop_length]
+    spec = rfft(frames * get_window(n_fft).astype(np.float32), axis=-1)
+    power = np.square(spec.real, dtype=np.float32) + np.square(spec.imag, dtype=np.float32)
+    return power.transpose(0, 2, 1)
+
+
+def _num_frames(lengths, hop_length):
+    return 1 + lengths // hop_length
+
+
+def _power_to_db(S, num_frames, ref_max, amin=1e-10, top_db=80.0):
+    # librosa.power_to_db per item, ignoring the frames past each item's end
+    log_S = 10.0 * np.log10(np.maximum(amin, S))
+    valid = np.arange(S.shape[-1])[None, None, :] < num_frames[:, None, None]
+    if ref_max:
+        ref = np.where(valid, S, -np.inf).max(axis=(1, 2), keepdims=True)
+        log_S -= 10.0 * np.log10(np.maximum(amin, ref))
+    if top_db is not None:
+        peak = np.where(valid, log_S, -np.inf).max(axis=(1, 2), keepdims=True)
+        log_S = np.maximum(log_S, peak - top_db)
+    return log_S
+
+
+def _batched(wavs, compute, hop_length):
+    # Lists come back as lists of per-item arrays, (B, T) arrays as a single array
+    if isinstance(wavs, np.ndarray) and wavs.ndim == 2:
+        lengths = np.full(len(wavs), wavs.shape[1], dtype=np.int64)
+        return compute(wavs, lengths)
+    padded, lengths = pad_waveforms(wavs)
+    features = compute(padded, lengths)
+    return [feat[:, :n] for feat, n in zip(features, _num_frames(lengths, hop_length))]
+
+
+def batch_wav2mel(wavs, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+    """Batched `wav2mel`
+
+    Args:
+        wavs (list, ndarray): list of 1-D waveforms or a (B, T) array
+        sr (int): sampling rate shared by all waveforms
+
+    Returns:
+        list, ndarray: (n_mels, frames) log-mel spectrograms, a list for list inputs
+            and a (B, n_mels, frames) array for array inputs
+    """
+
+    def _compute(padded, lengths):
+        S = get_mel_filterbank(sr, n_fft, n_mels) @ batch_stft_power(padded, n_fft, hop_length)
+        return _power_to_db(S, _num_frames(lengths, hop_length), ref_max=True)
+
+    return _batched(wavs, _compute, hop_length)
+
+
+def batch_wav2mfcc(wavs, sr, n_mfcc=N_MFCC, n_fft=2048, hop_length=HOP_LENGTH, n_mels=128):
+    """Batched `wav2mfcc`
+
+    Args:
+        wavs (list, ndarray): list of 1-D waveforms or a (B, T) array
+        sr (int): sampling rate shared by all waveforms
+        n_fft (int, optional): FFT size. Defaults to 2048, as librosa.
+        n_mels (int, optional): mel bands before the DCT. Defaults to 128, as librosa.
+
+    Returns:
+        list, ndarray: (n_mfcc, frames) MFCCs, a list for list inputs
+            and a (B, n_mfcc, frames) array for array inputs
+    """
+
+    def _compute(padded, lengths):
+        S = get_mel_filterbank(sr, n_fft, n_mels) @ batch_stft_power(padded, n_fft, hop_length)
+        log_S = _power_to_db(S, _num_frames(lengths, hop_length), ref_max=False)
+        return (get_dct_matrix(n_mels, n_mfcc) @ log_S).astype(np.float32)
+
+    return _batched(wavs, _compute, hop_length)
+
+
+# ===============================================================================
+# Streaming features
+# ===============================================================================
+
+
+def iter_audio_blocks(fp, block_length, overlap=0, mono=True):
+    """Read an audio file block by block without loading it whole
+
+    Args:
+        fp (str): audio file path, any format supported by `soundfile`
+        block_length (int): number of samples per block
+        overlap (int, optional): samples shared by two consecutive blocks. Defaults to 0.
+        mono (bool, optional): average the channels. Defaults to True.
+
+    Yields:
+        ndarray: float32 block of (block_length,) samples, or (block_length, channels)
+            when not `mono`; the last block may be shorter
+    """
+    try:
+        import soundfile
+    except ImportError as e:
+        raise ImportError("No package `soundfile`, cannot execute `iter_audio_blocks`.") from e
+    with soundfile.SoundFile(fp) as f:
+        for block in f.blocks(block_length, overlap=overlap, dtype="float32", always_2d=True):
+            yield block.mean(axis=1) if mono else block
+
+
+class StreamingMelExtractor:
+    """Compute log-mel or MFCC frames incrementally over consecutive chunks
+
+    Samples that do not fill a whole frame yet are kept for the next `update`, so
+    the frames of all chunks, followed by `flush`, equal the frames computed on the
+    whole signal at once. Memory is bounded by one chunk plus one frame.
+
+    The dB scale uses a fixed reference of 1.0 and no `top_db` clipping, since
+    both `wav2mel`'s `ref=np.max` and clipping depend on the entire recording.
+
+    Usage:
+        extractor = StreamingMelExtractor(sr=16000, n_mfcc=40)
+        for block in iter_audio_blocks("call.wav", 16000 * 60):
+            mfcc = extractor.update(block)
+        mfcc = extractor.flush()
+    """
+
+    def __init__(self, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, n_mfcc=None):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.n_mfcc = n_mfcc
+        self.reset()
+
+    def reset(self):
+        # Centered frames start with n_fft // 2 zeros, as in librosa
+        self._buffer = np.zeros(self.n_fft // 2, dtype=np.float32)
+
+    def _compute(self, samples):
+        power = batch_stft_power(samples[None], self.n_fft, self.hop_length, center=False)[0]
+        log_S = 10.0 * np.log10(
+            np.maximum(1e-10, get_mel_filterbank(self.sr, self.n_fft, self.n_mels) @ power)
+        )
+        if self.n_mfcc is None:
+            return log_S
+        return (get_dct_matrix(self.n_mels, self.n_mfcc) @ log_S).astype(np.float32)
+
+    def update(self, samples):
+        """Feed the next chunk of samples
+
+        Returns:
+            ndarray: (n_mels or n_mfcc, frames) features of the frames completed by this chunk
+        """
+        buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        if len(buffer) < self.n_fft:
+            self._buffer = buffer
+            return np.zeros((self.n_mfcc or self.n_mels, 0), dtype=np.float32)
+
+        num_frames = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        features = self._compute(buffer[: (num_frames - 1) * self.hop_length + self.n_fft])
+        self._buffer = buffer[num_frames * self.hop_length :]
+        return features
+
+    def flush(self):
+        """Emit the last frames of the signal and reset the extractor"""
+        features = self.update(np.zeros(self.n_fft // 2, dtype=np.float32))
+        self.reset()
+        return features
+
+
+def iter_features_from_file(
+    fp,
+    block_duration=60.0,
+    n_fft=N_FFT,
+    hop_length=HOP_LENGTH,
+    n_mels=N_MELS,
+    n_mfcc=None,
+):
+    """Stream log-mel (or MFCC) frames of a long recording in constant memory
+
+    Features are computed at the native sampling rate of the file.
+
+    Args:
+        fp (str): audio file path
+        block_duration (float, optional): seconds of audio read at a time. Defaults to 60.0.
+        n_mfcc (int, optional): return MFCCs instead of log-mel. Defaults to None.
+
+    Yields:
+        ndarray: (n_mels or n_mfcc, frames) features, consecutive along time
+    """
+    try:
+        import soundfile
+    except ImportError as e:
+        raise ImportError(
+            "No package `soundfile`, cannot execute `iter_features_from_file`."
+        ) from e
+    sr = soundfile.info(fp).samplerate
+    extractor = StreamingMelExtractor(sr, n_fft, hop_length, n_mels, n_mfcc)
+    for block in iter_audio_blocks(fp, int(block_duration * sr)):
+        features = extractor.update(block)
+        if features.shape[1] > 0:
+            yield features
+    yield extractor.flush()
+
+
+# ===============================================================================
+# Spectrogram rendering
+# ===============================================================================
+
+# Anchor points of matplotlib's "jet" colormap: (position, value) per channel
+_JET_SEGMENTS = {
+    "red": [(0.0, 0), (0.35, 0), (0.66, 1), (0.89, 1), (1.0, 0.5)],
+    "green": [(0.0, 0), (0.125, 0), (0.375, 1), (0.64, 1), (0.91, 0), (1.0, 0)],
+    "blue": [(0.0, 0.5), (0.11, 1), (0.34, 1), (0.65, 0), (1.0, 0)],
+}
+
+
+@lru_cache(maxsize=None)
+def get_colormap_lut(cmap="jet"):
+    """256-entry RGB lookup table of a colormap
+
+    "jet" is built in; other names are read once from matplotlib.
+
+    Returns:
+        ndarray: read-only (256, 3) uint8 table
+    """
+    if cmap == "jet":
+        x = np.linspace(0, 1, 256)
+        lut = np.stack(
+            [
+                np.interp(x, *zip(*_JET_SEGMENTS[channel]))
+                for channel in ["red", "green", "blue"]
+            ],
+            axis=1,
+        )
+    else:
+        from matplotlib import colormaps
+
+        lut = colormaps[cmap].resampled(256)(np.arange(256))[:, :3]
+    return _readonly((lut * 255).astype(np.uint8))
+
+
+def render_spectrogram(spec, cmap="jet", size=None, vmin=None, vmax=None):
+    """Render a spectrogram to an RGB image with a colormap lookup
+
+    Low frequencies are at the bottom and values are scaled to the data range,
+    as `librosa.display.specshow` does. Thread-safe and matplotlib-free.
+
+    Args:
+        spec (ndarray): (n_bins, frames) spectrogram, e.g. from `wav2mel`
+        cmap (str, optional): colormap name. Defaults to "jet".
+        size ((width, height), optional): output size. Defaults to None, i.e. one pixel per bin.
+        vmin (float, optional): value mapped to the first color. Defaults to spec.min().
+        vmax (float, optional): value mapped to the last color. Defaults to spec.max().
+
+    Returns:
+        ndarray: (height, width, 3) uint8 RGB image
+    """
+    spec = np.asarray(spec, dtype=np.float32)
+    vmin = spec.min() if vmin is None else vmin
+    vmax = spec.max() if vmax is None else vmax
+    # same binning as matplotlib: [0, 1] is split into 256 equal bins
+    scale = 256.0 / (vmax - vmin) if vmax > vmin else 0.0
+    indexes = np.clip((spec[::-1] - vmin) * scale, 0, 255).astype(np.uint8)
+    img = get_colormap_lut(cmap)[indexes]
+    if size is not None:
+        img = cv2.resize(img, tuple(size), interpolation=cv2.INTER_NEAREST)
+    return img
+
+
+def save_spectrogram(spec, path_to_save, cmap="jet", size=None, vmin=None, vmax=None):
+    """Render a spectrogram with `render_spectrogram` and write it as PNG/JPEG"""
+    img = render_spectrogram(spec, cmap=cmap, size=size, vmin=vmin, vmax=vmax)
+    if not cv2.imwrite(path_to_save, cv2.cvtColor(img, cv2.COLOR_RGB2BGR)):
+        raise IOError(f"Cannot write image to {path_to_save}")
+    return path_to_save
+
+
+def _save_spectrogram(args, **kwargs):
+    spec, path_to_save = args
+    return save_spectrogram(spec, path_to_save, **kwargs)
+
+
+def save_spectrograms(specs, paths_to_save, num_worker=None, verbose=True, **kwargs):
+    """Save many spectrograms in parallel threads, see `save_spectrogram`
+
+    Returns:
+        list: saved paths
+    """
+    return pool_worker(
+        partial(_save_spectrogram, **kwargs),
+        list(zip(specs, paths_to_save)),
+        use_thread=True,
+        num_worker=num_worker,
+        verbose=verbose,
+    )
+
+
+# ===============================================================================
+# Feature store
+# ===============================================================================
+
+
+def compute_mel_from_file(fp, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, n_mfcc=None):
+    """Log-mel (or MFCC) features of a whole file at its native sampling rate"""
+    try:
+        import soundfile
+    except ImportError as e:
+        raise ImportError("No package `soundfile`, cannot execute `compute_mel_from_file`.") from e
+    wav, sr = soundfile.read(fp, dtype="float32", always_2d=True)
+    wav = wav.mean(axis=1)
+    if n_mfcc is None:
+        return batch_wav2mel([wav], sr, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels)[0]
+    return batch_wav2mfcc(
+        [wav], sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels
+    )[0]
+
+
+def _compute_clip_features(args):
+    clip_id, fp, params = args
+    return clip_id, compute_mel_from_file(fp, **params)
+
+
+class AudioFeatureStore:
+    """Features of an audio dataset computed once and served from a memory-mapped file
+
+    All clips are stored frame-major in a single float16 file next to a JSON
+    index of (offset, num_frames) per clip id. The index also records the
+    extraction parameters; building with different parameters discards the
+    stored features, while building with the same ones only computes the new clips.
+    Clip ids are JSON keys, so they are converted to `str`: `store[0]` and
+    `store["0"]` are the same clip.
+
+    Usage:
+        store = AudioFeatureStore("features/")
+        store.build({"clip_0": "clip_0.wav", ...}, n_mels=96, num_worker=16)
+        mel = store["clip_0"]  # (n_mels, frames) float16
+    """
+
+    DATA_FILE = "features.f16"
+    INDEX_FILE = "index.json"
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.data_file = os.path.join(root_dir, self.DATA_FILE)
+        self.index_file = os.path.join(root_dir, self.INDEX_FILE)
+        os.makedirs(root_dir, exist_ok=True)
+        self._data = None
+        self.index = {"params": None, "num_bins": None, "clips": {}}
+        if os.path.isfile(self.index_file):
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+
+    def __len__(self):
+        return len(self.index["clips"])
+
+    def __contains__(self, clip_id):
+        return str(clip_id) in self.index["clips"]
+
+    def __getitem__(self, clip_id):
+        return self.get(clip_id)
+
+    def keys(self):
+        return self.index["clips"].keys()
+
+    def _save_index(self):
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    def _clear(self, params):
+        self._data = None
+        if os.path.isfile(self.data_file):
+            os.remove(self.data_file)
+        self.index = {"params": params, "num_bins": None, "clips": {}}
+        self._save_index()
+
+    def build(
+        self,
+        clips,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH,
+        n_mels=N_MELS,
+        n_mfcc=None,
+        num_worker=None,
+        chunk_size=256,
+        verbose=True,
+    ):
+        """Compute and store the features of every clip not stored yet
+
+        Args:
+            clips (dict): clip id (converted to `str`) -> audio file path
+            chunk_size (int, optional): clips computed in parallel before being
+                appended to the data file, bounding memory use. Defaults to 256.
+
+        Returns:
+            list: ids of the newly computed clips
+        """
+        params = dict(n_fft=n_fft, hop_length=hop_length, n_mels=n_mels, n_mfcc=n_mfcc)
+        if self.index["params"] != params:
+            self._clear(params)
+
+        todo = [(str(clip_id), fp, params) for clip_id, fp in clips.items() if clip_id not in self]
+        offset = os.path.getsize(self.data_file) // 2 if os.path.isfile(self.data_file) else 0
+        for start in range(0, len(todo), chunk_size):
+            results = pool_worker(
+                _compute_clip_features,
+                todo[start : start + chunk_size],
+                num_worker=num_worker,
+                verbose=verbose,
+                tqdm_desc=f"Features {start}/{len(todo)}",
+            )
+            with open(self.data_file, "ab") as f:
+                for clip_id, features in results:
+                    # (num_bins, frames) -> frame-major rows
+                    f.write(np.ascontiguousarray(features.T, dtype=np.float16).tobytes())
+                    self.index["num_bins"] = features.shape[0]
+                    self.index["clips"][clip_id] = [offset // features.shape[0], features.shape[1]]
+                    offset += features.size
+            self._save_index()
+        self._data = None
+        return [clip_id for clip_id, _, _ in todo]
+
+    def get(self, clip_id, dtype=None):
+        """Return the (num_bins, frames) features of a clip
+
+        Args:
+            dtype (optional): cast the stored float16 features. Defaults to None,
+                i.e. a read-only view on the memory map.
+        """
+        frame_offset, num_frames = self.index["clips"][str(clip_id)]
+        if self._data is None:
+            self._data = np.memmap(self.data_file, dtype=np.float16, mode="r").reshape(
+                -1, self.index["num_bins"]
+            )
+        features = self._data[frame_offset : frame_offset + num_frames].T
+        return features if dtype is None else features.astype(dtype)
 
 
 # def spectrogram_image(
@@ -22,33 +22,537 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+import hashlib
+import http.client
+import itertools
+import os
+import random
+import sqlite3
+import threading
 import time
 import urllib.request as urllib_request
 import warnings
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 from io import BytesIO
+from urllib.parse import urljoin, urlsplit
 
 try:
     from PIL import Image
+    from tqdm import tqdm
 except ImportError as e:
     warnings.warn(e.msg)
 
 
-def download_img_with_url(url, retry=0, retry_gap=0.1, proxy=None):
+@lru_cache(maxsize=None)
+def _build_opener(proxy=None):
     if proxy == None:
         proxies = {}
     else:
         proxies = {"http": proxy, "https": proxy}
+    proxy_handler = urllib_request.ProxyHandler(proxies)
+    return urllib_request.build_opener(proxy_handler)
+
+
+def download_img_with_url(url, retry=0, retry_gap=0.1, proxy=None):
+    opener = _build_opener(proxy)
+    for attempt in range(retry + 1):
+        try:
+            img = Image.open(BytesIO(opener.open(url).read())).convert("RGB")
+            return img
+        except Exception as e:
+            if attempt < retry:
+                time.sleep(retry_gap)
+    return None
+
+
+# ===============================================================================
+# Bulk downloads
+# ===============================================================================
+
+
+class DownloadError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class BulkDownloader:
+    """Concurrent downloader with keep-alive connections, retries and a disk cache
+
+    Every worker thread keeps one persistent HTTP(S) connection per host. Failed
+    requests (connection errors, 429 and 5xx) are retried with exponential backoff
+    and jitter, honoring `Retry-After`. Bodies are stored once per content hash
+    under `cache_dir/objects`, and `cache_dir/urls` maps every URL to its object,
+    so URLs already on disk are skipped and duplicated images are stored once.
+    Images can be verified by PIL in a separate thread pool.
+
+    Usage:
+        downloader = BulkDownloader("cache/", num_worker=32)
+        results = downloader.download(urls)
+        img = Image.open(results[0]["path"])
+    """
+
+    MAX_REDIRECTS = 5
+
+    def __init__(
+        self,
+        cache_dir,
+        num_worker=16,
+        retry=3,
+        backoff=0.5,
+        max_backoff=30.0,
+        timeout=10.0,
+        decode=False,
+        num_decoder=4,
+        headers=None,
+    ):
+        self.cache_dir = cache_dir
+        self.num_worker = num_worker
+        self.retry = retry
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.decode = decode
+        self.num_decoder = num_decoder
+        self.headers = {"User-Agent": "mipkit", "Connection": "keep-alive"}
+        self.headers.update(headers or {})
+        self._local = threading.local()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+
+    # Cache --------------------------------------------------------------------
+
+    def _url_file(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha1(url.encode()).hexdigest())
+
+    def cached_path(self, url):
+        """Path of the cached body of `url`, or None if not downloaded yet"""
+        try:
+            with open(self._url_file(url), "r") as f:
+                path = os.path.join(self.cache_dir, "objects", f.read().strip())
+        except FileNotFoundError:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def _store(self, url, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.cache_dir, "objects", digest)
+        if not os.path.isfile(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        with open(self._url_file(url), "w") as f:
+            f.write(digest)
+        return path
+
+    # HTTP ---------------------------------------------------------------------
+
+    def _connection(self, scheme, netloc):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        key = (scheme, netloc)
+        if key not in conns:
+            if scheme == "https":
+                conns[key] = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conns[key] = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return conns[key]
+
+    def _drop_connection(self, scheme, netloc):
+        conn = getattr(self._local, "conns", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _request(self, scheme, netloc, path):
+        conn = self._connection(scheme, netloc)
+        reused = conn.sock is not None
+        try:
+            conn.request("GET", path, headers=self.headers)
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed the idle keep-alive connection before we got any
+            # response: reconnect and send the request again once, right away
+            if not reused:
+                raise
+            self._drop_connection(scheme, netloc)
+            conn = self._connection(scheme, netloc)
+            conn.request("GET", path, headers=self.headers)
+            response = conn.getresponse()
+        return response, response.read()
+
+    def fetch(self, url):
+        """GET `url` on this thread's keep-alive connection and return the body"""
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            try:
+                response, body = self._request(parts.scheme, parts.netloc, path)
+            except (http.client.HTTPException, OSError) as e:
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise DownloadError(f"{type(e).__name__}: {e}")
+            if response.will_close:
+                self._drop_connection(parts.scheme, parts.netloc)
+
+            if response.status in (301, 302, 303, 307, 308):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            if response.status == 200:
+                return body
+            retry_after = response.getheader("Retry-After")
+            raise DownloadError(
+                f"HTTP {response.status}",
+                retryable=response.status == 429 or response.status >= 500,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        raise DownloadError("Too many redirects", retryable=False)
+
+    def fetch_to_cache(self, url):
+        """Fetch `url` once, without retries, and store its body in the cache
+
+        Returns:
+            tuple: (cached path, number of bytes fetched)
+
+        Raises:
+            DownloadError: on connection errors and non-200 responses
+        """
+        content = self.fetch(url)
+        return self._store(url, content), len(content)
+
+    def _download_one(self, url):
+        path = self.cached_path(url)
+        if path is not None:
+            return {"url": url, "path": path, "status": "cached", "bytes": 0, "error": None}
+
+        for attempt in range(self.retry + 1):
+            try:
+                path, num_bytes = self.fetch_to_cache(url)
+                return {
+                    "url": url,
+                    "path": path,
+                    "status": "done",
+                    "bytes": num_bytes,
+                    "error": None,
+                }
+            except DownloadError as e:
+                error = e
+                if not e.retryable or attempt == self.retry:
+                    break
+                delay = min(self.max_backoff, self.backoff * 2**attempt)
+                delay = max(delay * random.uniform(0.5, 1.0), e.retry_after or 0)
+                time.sleep(delay)
+        return {"url": url, "path": None, "status": "failed", "bytes": 0, "error": str(error)}
+
+    @staticmethod
+    def _decode(result):
+        try:
+            with Image.open(result["path"]) as img:
+                img.load()
+                result["size"] = img.size
+        except Exception as e:
+            result["status"] = "invalid"
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    def download(self, urls, verbose=True):
+        """Download every URL not cached yet
+
+        At most twice `num_worker` URLs are submitted to the thread pool at a time,
+        so memory does not grow with the number of URLs.
+
+        Args:
+            urls (list): URLs to fetch
+            verbose (bool, optional): progress bar and throughput summary. Defaults to True.
+
+        Returns:
+            list: one dict per URL (url, path, status, bytes, error), in input order.
+                status is "done", "cached", "failed", or "invalid" when `decode` rejects it.
+        """
+        start_time = time.perf_counter()
+        results = [None] * len(urls)
+        decoder = ThreadPoolExecutor(self.num_decoder) if self.decode else None
+        decodes = []
+        window = 2 * self.num_worker
+        items = enumerate(urls)
+        with ThreadPoolExecutor(self.num_worker) as pool:
+            futures = {}
+            progress = tqdm(total=len(urls), desc="Downloading", disable=not verbose)
+            while True:
+                for i, url in itertools.islice(items, window - len(futures)):
+                    futures[pool.submit(self._download_one, url)] = i
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[futures.pop(future)] = result
+                    if decoder is not None and result["path"] is not None:
+                        decodes.append(decoder.submit(self._decode, result))
+                    progress.update()
+            progress.close()
+        if decoder is not None:
+            for future in decodes:
+                future.result()
+            decoder.shutdown()
+
+        if verbose:
+            print(self.summary(results, time.perf_counter() - start_time))
+        return results
+
+    @staticmethod
+    def summary(results, elapsed):
+        counts = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        num_bytes = sum(r["bytes"] for r in results)
+        elapsed = max(elapsed, 1e-9)
+        return (
+            f"> {len(results)} URLs in {elapsed:.2f}s ({len(results) / elapsed:.1f} URLs/s, "
+            f"{num_bytes / elapsed / 2**20:.2f} MB/s) - "
+            + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        )
+
+
+# ===============================================================================
+# Resumable download jobs
+# ===============================================================================
+
+
+class DownloadManifest:
+    """SQLite manifest recording the status of every URL of a download job
+
+    Every URL is in one of the states "pending", "done", "retry" (to be fetched
+    again after `retry_at`) or "failed". Since the manifest is on disk, a job that
+    was interrupted resumes from the URLs that are not done yet.
+
+    Usage:
+        manifest = DownloadManifest("crawl.sqlite")
+        manifest.add(urls)
+        run_download_manifest(manifest, BulkDownloader("cache/"), rate_per_host=2)
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self._conn = sqlite3.connect(manifest_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            "url TEXT PRIMARY KEY, host TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, retry_at REAL NOT NULL DEFAULT 0, "
+            "path TEXT, error TEXT, updated REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS downloads_status ON downloads (status, retry_at)"
+        )
+        self._conn.commit()
+
+    def add(self, urls):
+        """Register URLs, keeping the state of those already in the manifest"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO downloads (url, host) VALUES (?, ?)",
+                ((url, urlsplit(url).netloc) for url in urls),
+            )
+
+    def due(self, now=None):
+        """(url, host, attempts) of pending URLs and retries whose time has come"""
+        now = time.time() if now is None else now
+        return self._conn.execute(
+            "SELECT url, host, attempts FROM downloads "
+            "WHERE status = 'pending' OR (status = 'retry' AND retry_at <= ?)",
+            (now,),
+        ).fetchall()
+
+    def next_retry_at(self):
+        """Earliest `retry_at` of the URLs waiting for a retry, or None"""
+        return self._conn.execute(
+            "SELECT MIN(retry_at) FROM downloads WHERE status = 'retry'"
+        ).fetchone()[0]
+
+    def update(self, records):
+        """Store (url, status, attempts, retry_at, path, error) records"""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE downloads SET status = ?, attempts = ?, retry_at = ?, path = ?, "
+                "error = ?, updated = ? WHERE url = ?",
+                ((s, a, r, p, e, now, url) for url, s, a, r, p, e in records),
+            )
+
+    def counts(self):
+        return dict(
+            self._conn.execute("SELECT status, COUNT(*) FROM downloads GROUP BY status")
+        )
+
+    def get(self, url):
+        """Manifest row of `url` as a dict, or None if it was never added"""
+        cursor = self._conn.execute("SELECT * FROM downloads WHERE url = ?", (url,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def failed(self):
+        """(url, error) of the URLs that ran out of attempts"""
+        return self._conn.execute(
+            "SELECT url, error FROM downloads WHERE status = 'failed'"
+        ).fetchall()
+
+    def reset_failed(self):
+        """Schedule failed URLs again with a fresh attempt budget"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE downloads SET status = 'pending', attempts = 0, retry_at = 0 "
+                "WHERE status = 'failed'"
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def _fetch_once(downloader, url):
+    path = downloader.cached_path(url)
+    if path is not None:
+        return path, None
     try:
-        proxy_handler = urllib_request.ProxyHandler(proxies)
-        opener = urllib_request.build_opener(proxy_handler)
-        img = Image.open(BytesIO(opener.open(url).read())).convert("RGB")
-        return img
-    except Exception as e:
-        if retry > 0:
-            time.sleep(retry_gap)
-            return download_img_with_url(url, retry=retry - 1, proxy=proxy)
+        return downloader.fetch_to_cache(url)[0], None
+    except DownloadError as e:
+        return None, e
+
+
+def run_download_manifest(
+    manifest,
+    downloader,
+    max_per_host=4,
+    rate_per_host=None,
+    max_attempts=5,
+    wait_retries=True,
+    commit_every=64,
+    verbose=True,
+):
+    """Download every URL of `manifest` that is not done yet
+
+    Requests are scheduled host by host: at most `max_per_host` requests are in
+    flight per host, and consecutive requests to a host start at least
+    `1 / rate_per_host` seconds apart. A host that answers with `Retry-After` is
+    left alone for that long. Failed URLs are rescheduled with exponential
+    backoff (`downloader.backoff`, `downloader.max_backoff`) until they reach
+    `max_attempts`. The manifest is committed every `commit_every` results and
+    when the job stops, so an interrupted job can simply be run again.
+
+    Args:
+        manifest (DownloadManifest): job manifest
+        downloader (BulkDownloader): fetches and caches the bodies, its `num_worker`
+            bounds the total number of requests in flight
+        max_per_host (int, optional): concurrent requests per host. Defaults to 4.
+        rate_per_host (float, optional): requests per second per host, None for no
+            limit. Defaults to None.
+        max_attempts (int, optional): attempts before a URL is marked failed.
+            Defaults to 5.
+        wait_retries (bool, optional): sleep until scheduled retries are due instead
+            of returning. Defaults to True.
+        commit_every (int, optional): results per manifest commit. Defaults to 64.
+        verbose (bool, optional): progress bar and summary. Defaults to True.
+
+    Returns:
+        dict: number of URLs per status in the manifest
+    """
+    interval = 1.0 / rate_per_host if rate_per_host else 0.0
+    next_slot = {}
+    records = []
+    start_time = time.perf_counter()
+    num_results = 0
+
+    def handle(future, url, host, attempts):
+        path, error = future.result()
+        attempts += 1
+        if error is None:
+            records.append((url, "done", attempts, 0, path, None))
+            return
+        if error.retry_after:
+            next_slot[host] = max(next_slot.get(host, 0), time.monotonic() + error.retry_after)
+        if error.retryable and attempts < max_attempts:
+            delay = min(downloader.max_backoff, downloader.backoff * 2 ** (attempts - 1))
+            delay = max(delay * random.uniform(0.5, 1.0), error.retry_after or 0)
+            records.append((url, "retry", attempts, time.time() + delay, None, str(error)))
         else:
-            return None
+            records.append((url, "failed", attempts, 0, None, str(error)))
+
+    progress = tqdm(desc="Downloading", disable=not verbose)
+    pool = ThreadPoolExecutor(downloader.num_worker)
+    try:
+        while True:
+            due = manifest.due()
+            if not due:
+                retry_at = manifest.next_retry_at()
+                if retry_at is None or not wait_retries:
+                    break
+                time.sleep(max(0, retry_at - time.time()))
+                continue
+
+            queues = {}
+            for url, host, attempts in due:
+                queues.setdefault(host, deque()).append((url, attempts))
+            progress.total = (progress.total or 0) + len(due)
+            progress.refresh()
+            inflight = dict.fromkeys(queues, 0)
+            futures = {}
+            while queues or futures:
+                now = time.monotonic()
+                wake = None
+                for host in list(queues):
+                    queue = queues[host]
+                    while (
+                        queue
+                        and len(futures) < downloader.num_worker
+                        and inflight[host] < max_per_host
+                        and next_slot.get(host, 0) <= now
+                    ):
+                        url, attempts = queue.popleft()
+                        inflight[host] += 1
+                        next_slot[host] = now + interval
+                        future = pool.submit(_fetch_once, downloader, url)
+                        futures[future] = (url, host, attempts)
+                    if not queue:
+                        del queues[host]
+                    elif inflight[host] < max_per_host and len(futures) < downloader.num_worker:
+                        wake = next_slot[host] if wake is None else min(wake, next_slot[host])
+
+                timeout = None if wake is None else max(0, wake - now)
+                if not futures:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, host, attempts = futures.pop(future)
+                    inflight[host] -= 1
+                    handle(future, url, host, attempts)
+                    num_results += 1
+                    progress.update()
+                if len(records) >= commit_every:
+                    manifest.update(records)
+                    records.clear()
+            manifest.update(records)
+            records.clear()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        manifest.update(records)
+        progress.close()
+
+    counts = manifest.counts()
+    if verbose:
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        print(
+            f"> {num_results} requests in {elapsed:.2f}s ({num_results / elapsed:.1f} req/s) - "
+            + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        )
+    return counts
 
 
 def download_from_youtube(output_path, video_id):
@@ -28,6 +28,7 @@ import warnings
 import cv2
 import numpy as np
 
+from ..mprocess import pool_worker
 from .helpers import FACIAL_LANDMARKS_5_IDXS, FACIAL_LANDMARKS_68_IDXS
 
 
@@ -74,8 +75,8 @@ def face_align(
     # compute center (x, y)-coordinates (i.e., the median point)
     # between the two eyes in the input image
     eyesCenter = (
-        (leftEyeCenter[0] + rightEyeCenter[0]) // 2,
-        (leftEyeCenter[1] + rightEyeCenter[1]) // 2,
+        int(leftEyeCenter[0] + rightEyeCenter[0]) // 2,
+        int(leftEyeCenter[1] + rightEyeCenter[1]) // 2,
     )
 
     # grab the rotation matrix for rotating and scaling the face
@@ -93,3 +94,99 @@ def face_align(
 
     # return the aligned face
     return output
+
+
+def get_face_align_matrices(
+    landmarks,
+    desiredLeftEye=(0.35, 0.35),
+    desiredFaceWidth=256,
+    desiredFaceHeight=256,
+):
+    """Compute the `face_align` affine matrices of many faces at once
+
+    Args:
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+
+    Returns:
+        numpy.array: (N, 2, 3) float64 affine matrices
+    """
+    landmarks = np.asarray(landmarks)
+    assert landmarks.ndim == 3 and landmarks.shape[2] == 2, "landmarks should have shape (N, K, 2)."
+    if landmarks.shape[1] == 68:
+        (lStart, lEnd) = FACIAL_LANDMARKS_68_IDXS["left_eye"]
+        (rStart, rEnd) = FACIAL_LANDMARKS_68_IDXS["right_eye"]
+    else:
+        (lStart, lEnd) = FACIAL_LANDMARKS_5_IDXS["left_eye"]
+        (rStart, rEnd) = FACIAL_LANDMARKS_5_IDXS["right_eye"]
+
+    # eye centroids, truncated to int as in `face_align`
+    leftEyeCenter = landmarks[:, lStart:lEnd].mean(axis=1).astype("int")
+    rightEyeCenter = landmarks[:, rStart:rEnd].mean(axis=1).astype("int")
+
+    dY = rightEyeCenter[:, 1] - leftEyeCenter[:, 1]
+    dX = rightEyeCenter[:, 0] - leftEyeCenter[:, 0]
+    angle = np.radians(np.degrees(np.arctan2(dY, dX)) - 180)
+
+    desiredRightEyeX = 1.0 - desiredLeftEye[0]
+    dist = np.sqrt((dX**2) + (dY**2))
+    desiredDist = (desiredRightEyeX - desiredLeftEye[0]) * desiredFaceWidth
+    scale = desiredDist / dist
+
+    eyesCenter = (leftEyeCenter + rightEyeCenter) // 2
+    cX = eyesCenter[:, 0]
+    cY = eyesCenter[:, 1]
+
+    # same layout as cv2.getRotationMatrix2D
+    alpha = scale * np.cos(angle)
+    beta = scale * np.sin(angle)
+    M = np.empty((len(landmarks), 2, 3), dtype=np.float64)
+    M[:, 0, 0] = alpha
+    M[:, 0, 1] = beta
+    M[:, 0, 2] = (1 - alpha) * cX - beta * cY
+    M[:, 1, 0] = -beta
+    M[:, 1, 1] = alpha
+    M[:, 1, 2] = beta * cX + (1 - alpha) * cY
+
+    # update the translation component of the matrix
+    tX = desiredFaceWidth * 0.5
+    tY = desiredFaceHeight * desiredLeftEye[1]
+    M[:, 0, 2] += tX - cX
+    M[:, 1, 2] += tY - cY
+    return M
+
+
+def face_align_batch(
+    image,
+    landmarks,
+    desiredLeftEye=(0.35, 0.35),
+    desiredFaceWidth=256,
+    desiredFaceHeight=256,
+    out=None,
+    num_worker=1,
+):
+    """Align many faces at once, see `face_align`
+
+    Args:
+        image (numpy.array, list): the image all faces come from, or one image per face
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+        out (numpy.array, optional): preallocated (N, H, W, C) output. Defaults to None.
+        num_worker (int, optional): number of threads running `cv2.warpAffine`. Defaults to 1.
+
+    Returns:
+        numpy.array: (N, desiredFaceHeight, desiredFaceWidth, C) aligned faces
+    """
+    M = get_face_align_matrices(landmarks, desiredLeftEye, desiredFaceWidth, desiredFaceHeight)
+    images = image if isinstance(image, (list, tuple)) else [image] * len(M)
+    assert len(images) == len(M), "image should be a single image or one image per face."
+
+    (w, h) = (desiredFaceWidth, desiredFaceHeight)
+    out_shape = (len(M), h, w) + images[0].shape[2:]
+    if out is None:
+        out = np.empty(out_shape, dtype=images[0].dtype)
+    assert out.shape == out_shape, f"out should have shape {out_shape}."
+
+    def _warp(i):
+        cv2.warpAffine(images[i], M[i], (w, h), dst=out[i], flags=cv2.INTER_CUBIC)
+
+    pool_worker(_warp, list(range(len(M))), use_thread=True, num_worker=num_worker, verbose=False)
+    return out
@@ -25,6 +25,8 @@ THE SOFTWARE.
 
 from collections import OrderedDict
 
+import numpy as np
+
 FACIAL_LANDMARKS_68_IDXS = OrderedDict(
     [
         ("mouth", (48, 68)),
@@ -40,3 +42,139 @@ FACIAL_LANDMARKS_68_IDXS = OrderedDict(
 
 # For dlib’s 5-point facial landmark detector:
 FACIAL_LANDMARKS_5_IDXS = OrderedDict([("right_eye", (2, 3)), ("left_eye", (0, 1)), ("nose", (4))])
+
+
+def _to_index_arrays(idxs):
+    indices = OrderedDict()
+    for name, idx in idxs.items():
+        if isinstance(idx, int):
+            indices[name] = np.array([idx])
+        else:
+            indices[name] = np.arange(*idx)
+    return indices
+
+
+# Landmark indices of every region as numpy arrays, e.g. for `landmarks[:, indices]`
+FACIAL_LANDMARKS_68_INDICES = _to_index_arrays(FACIAL_LANDMARKS_68_IDXS)
+FACIAL_LANDMARKS_5_INDICES = _to_index_arrays(FACIAL_LANDMARKS_5_IDXS)
+
+
+def _region_masks(num_landmarks):
+    indices = FACIAL_LANDMARKS_68_INDICES if num_landmarks == 68 else FACIAL_LANDMARKS_5_INDICES
+    masks = np.zeros((len(indices), num_landmarks), dtype=bool)
+    for i, idx in enumerate(indices.values()):
+        masks[i, idx] = True
+    return list(indices.keys()), masks
+
+
+# (num_regions, num_landmarks) membership masks, in the order of the index tables
+_REGION_MASKS = {68: _region_masks(68), 5: _region_masks(5)}
+
+
+def _as_landmarks(landmarks):
+    landmarks = np.asarray(landmarks)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[None]
+    assert landmarks.ndim == 3 and landmarks.shape[1:] in [(68, 2), (5, 2)], (
+        "landmarks should have shape (N, 68, 2) or (N, 5, 2)."
+    )
+    return landmarks
+
+
+def _select_regions(landmarks, regions):
+    names, masks = _REGION_MASKS[landmarks.shape[1]]
+    if regions is None:
+        return names, masks
+    return regions, masks[[names.index(region) for region in regions]]
+
+
+def compute_region_centroids(landmarks, regions=None):
+    """Compute the centroid of every facial region
+
+    Args:
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+        regions (list, optional): region names. Defaults to None, i.e. all regions.
+
+    Returns:
+        OrderedDict: region name -> (N, 2) centroids
+    """
+    landmarks = _as_landmarks(landmarks)
+    names, masks = _select_regions(landmarks, regions)
+    weights = masks / masks.sum(axis=1, keepdims=True)
+    centroids = np.einsum("rk,nkd->rnd", weights, landmarks)
+    return OrderedDict(zip(names, centroids))
+
+
+def compute_region_bboxes(landmarks, regions=None):
+    """Compute the bounding box of every facial region
+
+    Args:
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+        regions (list, optional): region names. Defaults to None, i.e. all regions.
+
+    Returns:
+        OrderedDict: region name -> (N, 4) bboxes in default format (x, y, xx, yy)
+    """
+    landmarks = _as_landmarks(landmarks)
+    names, masks = _select_regions(landmarks, regions)
+    points = landmarks[None, :, :, :]
+    inside = masks[:, None, :, None]
+    top_left = np.where(inside, points, np.inf).min(axis=2)
+    bottom_right = np.where(inside, points, -np.inf).max(axis=2)
+    bboxes = np.concatenate([top_left, bottom_right], axis=2)
+    return OrderedDict(zip(names, bboxes))
+
+
+def compute_inter_ocular_distance(landmarks):
+    """Distance between the two eye centroids
+
+    Args:
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+
+    Returns:
+        numpy.array: (N,) distances
+    """
+    centroids = compute_region_centroids(landmarks, ["left_eye", "right_eye"])
+    return np.linalg.norm(centroids["left_eye"] - centroids["right_eye"], axis=1)
+
+
+def compute_eye_aspect_ratio(landmarks):
+    """Eye aspect ratio (Soukupova and Cech, 2016) of both eyes
+
+    Args:
+        landmarks (numpy.array): (N, 68, 2) landmarks
+
+    Returns:
+        tuple: (N,) left eye ratios, (N,) right eye ratios
+    """
+    landmarks = _as_landmarks(landmarks)
+    assert landmarks.shape[1] == 68, "eye aspect ratio needs 68-point landmarks."
+
+    def _ratio(eye):
+        vertical = np.linalg.norm(eye[:, [1, 2]] - eye[:, [5, 4]], axis=2).sum(axis=1)
+        horizontal = np.linalg.norm(eye[:, 0] - eye[:, 3], axis=1)
+        return vertical / (2.0 * horizontal)
+
+    return (
+        _ratio(landmarks[:, FACIAL_LANDMARKS_68_INDICES["left_eye"]]),
+        _ratio(landmarks[:, FACIAL_LANDMARKS_68_INDICES["right_eye"]]),
+    )
+
+
+def crop_landmark_regions(image, landmarks, region, margin=0):
+    """Crop one facial region of every face from an image
+
+    Args:
+        image (numpy.array): (H, W, C) image the landmarks come from
+        landmarks (numpy.array): (N, 68, 2) or (N, 5, 2) landmarks
+        region (str): region name, e.g. "mouth"
+        margin (int, optional): pixels added around the region. Defaults to 0.
+
+    Returns:
+        list: N crops (views into `image`)
+    """
+    h, w = image.shape[:2]
+    bboxes = compute_region_bboxes(landmarks, [region])[region]
+    bboxes = np.round(bboxes + np.array([-margin, -margin, margin, margin])).astype(int)
+    bboxes = np.clip(bboxes, 0, [w, h, w, h])
+    return [image[y:yy, x:xx] for x, y, xx, yy in bboxes]
@@ -30,50 +30,93 @@ try:
     import cv2
     import numpy as np
     import PIL
-    import torchvision.transforms.functional as F
     from PIL import Image, ImageDraw
 except ImportError as e:
     warnings.warn(e.msg)
 
+try:
+    import torchvision.transforms.functional as F
+except ImportError as e:
+    warnings.warn(e.msg)
 
-def combine_images(images: list, axis=1):
+
+def combine_images(images: list, axis=1, out=None):
     """Combine images
 
+    The output canvas is allocated once and every image is copied straight into
+    its slot; the remaining area of each slot is filled with zeros.
+
     Args:
         images (list): image list (must have the same dimension)
         axis (int): merge direction
             When axis = 0, the images are merged vertically;
             When axis = 1, the images are merged horizontally.
+        out (numpy.array, optional): preallocated canvas with the merged shape. Defaults to None.
     Returns:
         merge image
     """
     ndim = images[0].ndim
-    shapes = np.array([mat.shape for mat in images])
-    assert np.all(map(lambda e: len(e) == ndim, shapes)), "all images should be same ndim."
+    assert all(img.ndim == ndim for img in images), "all images should be same ndim."
+    heights = [img.shape[0] for img in images]
+    widths = [img.shape[1] for img in images]
     if axis == 0:  # merge images vertically
-        # Merge image cols
-        cols = np.max(shapes[:, 1])
+        canvas_shape = (sum(heights), max(widths)) + images[0].shape[2:]
+    else:  # merge images horizontally
+        canvas_shape = (max(heights), sum(widths)) + images[0].shape[2:]
+
+    if out is None:
+        out = np.empty(canvas_shape, dtype=np.result_type(*images))
+    assert out.shape == canvas_shape, f"out should have shape {canvas_shape}."
+
+    offset = 0
+    for img, h, w in zip(images, heights, widths):
+        if axis == 0:
+            out[offset : offset + h, :w] = img
+            out[offset : offset + h, w:] = 0
+            offset += h
+        else:
+            out[:h, offset : offset + w] = img
+            out[h:, offset : offset + w] = 0
+            offset += w
+    return out
 
-        # Expand the cols size of each image to make the cols consistent
-        copy_imgs = [
-            cv2.copyMakeBorder(img, 0, 0, 0, cols - img.shape[1], cv2.BORDER_CONSTANT, (0, 0, 0))
-            for img in images
-        ]
-        # Merge vertically
-        return np.vstack(copy_imgs)
 
-    else:  # merge images horizontally
-        # Combine the rows of the image
-        rows = np.max(shapes[:, 0])
+def combine_images_grid(images: list, ncols, out=None):
+    """Tile images into a grid with a single output allocation
+
+    Every row is as tall as its tallest image and every column as wide as its
+    widest image; images are placed at the top-left of their cell.
 
-        # Expand the row size of each image to make rows consistent
-        copy_imgs = [
-            cv2.copyMakeBorder(img, 0, rows - img.shape[0], 0, 0, cv2.BORDER_CONSTANT, (0, 0, 0))
-            for img in images
-        ]
+    Args:
+        images (list): image list (must have the same dimension), in row-major order
+        ncols (int): number of columns of the grid
+        out (numpy.array, optional): preallocated canvas with the grid shape. Defaults to None.
+    Returns:
+        grid image
+    """
+    ndim = images[0].ndim
+    assert all(img.ndim == ndim for img in images), "all images should be same ndim."
+    nrows = (len(images) + ncols - 1) // ncols
+    row_heights = [0] * nrows
+    col_widths = [0] * ncols
+    for i, img in enumerate(images):
+        row_heights[i // ncols] = max(row_heights[i // ncols], img.shape[0])
+        col_widths[i % ncols] = max(col_widths[i % ncols], img.shape[1])
+    canvas_shape = (sum(row_heights), sum(col_widths)) + images[0].shape[2:]
+
+    if out is None:
+        out = np.zeros(canvas_shape, dtype=np.result_type(*images))
+    else:
+        assert out.shape == canvas_shape, f"out should have shape {canvas_shape}."
+        out.fill(0)
 
-        # Merge horizontally
-        return np.hstack(copy_imgs)
+    row_offsets = np.cumsum([0] + row_heights)
+    col_offsets = np.cumsum([0] + col_widths)
+    for i, img in enumerate(images):
+        y = row_offsets[i // ncols]
+        x = col_offsets[i % ncols]
+        out[y : y + img.shape[0], x : x + img.shape[1]] = img
+    return out
 
 
 def convert_to_torch_image(img):
@@ -125,19 +168,28 @@ def read_image_experiments(file_path: str, to_rgb=True, vis=False, to_tensor=Fal
     return {"img_raw": img, "img_tensor": img_tensor}
 
 
-def padding_image(img_arr):
+def padding_image(img_arr, out=None):
     w, h, c = img_arr.shape
     if w > h:
         padd = (w - h) // 2
-        img_arr = cv2.copyMakeBorder(
-            img_arr.copy(), 10, 10, padd, padd, cv2.BORDER_CONSTANT, value=0
-        )
+        top, left = 10, padd
     elif w < h:
         padd = (h - w) // 2
-        img_arr = cv2.copyMakeBorder(
-            img_arr.copy(), padd, padd, 10, 10, cv2.BORDER_CONSTANT, value=0
-        )
-    return img_arr
+        top, left = padd, 10
+    else:
+        top = left = 0
+    if out is not None:
+        out_shape = (w + 2 * top, h + 2 * left, c)
+        assert out.shape == out_shape, f"out should have shape {out_shape}."
+        assert out.dtype == img_arr.dtype, f"out should have dtype {img_arr.dtype}."
+    if w == h:
+        if out is None:
+            return img_arr
+        out[...] = img_arr
+        return out
+    return cv2.copyMakeBorder(
+        img_arr, top, top, left, left, cv2.BORDER_CONSTANT, dst=out, value=0
+    )
 
 
 def _get_type(img):
@@ -171,17 +223,17 @@ def square_box(img, box):
     x, y, xx, yy = box
     _cx = (xx + x) / 2
     _delta_y = (yy - y) / 2
-    x = int(np.max([0, _cx - _delta_y]))
-    xx = int(np.min([w, _cx + _delta_y]))
+    x = int(max(0, _cx - _delta_y))
+    xx = int(min(w, _cx + _delta_y))
 
-    x = np.max([0, x])
-    y = np.max([0, y])
+    x = max(0, x)
+    y = max(0, y)
     return [x, y, xx, yy]
 
 
 def compute_bbox_area(bbox):
     x, y, xx, yy = bbox
-    return (yy - y) * (y - x)
+    return (yy - y) * (xx - x)
 
 
 def get_biggest_bbox_area(bboxes):
@@ -194,7 +246,7 @@ def get_biggest_bbox_area(bboxes):
         tuple: the biggest bbox, index
     """
     if len(bboxes) > 0:
-        biggest_idx = np.argmax([compute_bbox_area(bbox) for bbox in bboxes])
+        biggest_idx = np.argmax(compute_bboxes_area(bboxes))
         return bboxes[biggest_idx], biggest_idx
     else:
         return bboxes, -1
@@ -234,11 +286,21 @@ def load_image_from_file(fpath, mode="rgb", to_numpy=False):
     return pil_img
 
 
-def binarize_mask(img_arr, threshold=0.5):
-    img_arr = img_arr.copy()
-    img_arr[img_arr >= threshold] = 1
-    img_arr[img_arr < threshold] = 0
-    return img_arr.astype(np.uint8)
+def binarize_mask(img_arr, threshold=0.5, out=None):
+    """Binarize a mask into 0/1 values
+
+    Args:
+        img_arr (numpy.array): input mask
+        threshold (float, optional): values >= threshold become 1. Defaults to 0.5.
+        out (numpy.array, optional): output buffer, may be `img_arr` itself to
+            binarize in place. Defaults to None, i.e. a new uint8 array.
+
+    Returns:
+        numpy.array: binary mask
+    """
+    if out is None:
+        out = np.empty(img_arr.shape, dtype=np.uint8)
+    return np.greater_equal(img_arr, threshold, out=out, casting="unsafe")
 
 
 def pil_to_array(img_pil):
@@ -249,8 +311,12 @@ def array_to_pil(img_arr):
     return Image.fromarray(img_arr)
 
 
-def gray_to_rgb(img_arr):
-    return np.dstack([img_arr, img_arr, img_arr])
+def gray_to_rgb(img_arr, out=None):
+    h, w = img_arr.shape[:2]
+    if out is None:
+        out = np.empty((h, w, 3), dtype=img_arr.dtype)
+    out[...] = img_arr.reshape(h, w, -1)
+    return out
 
 
 def rgb_to_gray(img_arr):
@@ -273,10 +339,10 @@ def expand_box(img, box, ratio=1.0):
     y -= delta_x
     xx += delta_x
     yy += delta_x
-    x = int(np.max([0, x]))
-    y = int(np.max([0, y]))
-    xx = int(np.max([0, xx]))
-    yy = int(np.max([0, yy]))
+    x = int(max(0, x))
+    y = int(max(0, y))
+    xx = int(max(0, xx))
+    yy = int(max(0, yy))
     return [x, y, xx, yy]
 
 
@@ -315,3 +381,350 @@ def random_rotate_with_box(img_pil, box, rot_range=[-10, 10], debug=False):
 
 def blend_imgs(src1, src2, alpha=0.5):
     return cv2.addWeighted(src1, alpha, src2, 1 - alpha, 0)
+
+
+# ===============================================================================
+# Batched bounding boxes
+# ===============================================================================
+
+BBOX_FORMATS = ["default", "coco", "cxcywh"]
+
+
+def _as_bboxes(bboxes):
+    bboxes = np.asarray(bboxes)
+    if bboxes.size == 0:
+        bboxes = bboxes.reshape(0, 4)
+    assert bboxes.ndim == 2 and bboxes.shape[1] == 4, "bboxes should have shape (N, 4)."
+    return bboxes
+
+
+def _get_image_size(img):
+    if isinstance(img, (tuple, list)):
+        w, h = img
+    elif isinstance(img, PIL.Image.Image):
+        w, h = img.size
+    elif isinstance(img, np.ndarray):
+        h, w = img.shape[:2]
+    else:
+        raise TypeError("img is not valid. Expect `ndarray`, `PIL` or (width, height)")
+    return w, h
+
+
+def compute_bboxes_area(bboxes):
+    """Compute the area of every bounding box
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes in default format (x, y, xx, yy)
+
+    Returns:
+        numpy.array: (N,) areas, same values as `compute_bbox_area`
+    """
+    bboxes = _as_bboxes(bboxes)
+    return (bboxes[:, 3] - bboxes[:, 1]) * (bboxes[:, 2] - bboxes[:, 0])
+
+
+def compute_iou_matrix(bboxes_a, bboxes_b=None):
+    """Compute the pairwise IoU between two sets of bounding boxes
+
+    Args:
+        bboxes_a (numpy.array, list): (N, 4) bboxes in default format
+        bboxes_b (numpy.array, list, optional): (M, 4) bboxes in default format.
+            Defaults to None, i.e. `bboxes_a` against itself.
+
+    Returns:
+        numpy.array: (N, M) float64 IoU matrix
+    """
+    bboxes_a = _as_bboxes(bboxes_a).astype(np.float64)
+    bboxes_b = bboxes_a if bboxes_b is None else _as_bboxes(bboxes_b).astype(np.float64)
+
+    top_left = np.maximum(bboxes_a[:, None, :2], bboxes_b[None, :, :2])
+    bottom_right = np.minimum(bboxes_a[:, None, 2:], bboxes_b[None, :, 2:])
+    inter_wh = np.clip(bottom_right - top_left, 0, None)
+    inter = inter_wh[..., 0] * inter_wh[..., 1]
+
+    union = compute_bboxes_area(bboxes_a)[:, None] + compute_bboxes_area(bboxes_b)[None, :]
+    union -= inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def clip_bboxes(bboxes, img):
+    """Clip bounding boxes to the image boundary
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes in default format
+        img (numpy.array, PIL.Image, tuple): image or its (width, height)
+
+    Returns:
+        numpy.array: (N, 4) clipped bboxes
+    """
+    bboxes = _as_bboxes(bboxes)
+    w, h = _get_image_size(img)
+    return np.clip(bboxes, 0, [w, h, w, h]).astype(bboxes.dtype, copy=False)
+
+
+def expand_bboxes(img, bboxes, ratio=1.0):
+    """Batched version of `expand_box`
+
+    Returns:
+        numpy.array: (N, 4) int64 bboxes
+    """
+    bboxes = _as_bboxes(bboxes)
+    _get_image_size(img)
+    _w = bboxes[:, 2] - bboxes[:, 0]
+    delta_x = (_w * ratio - _w)[:, None]
+    expanded = np.concatenate([bboxes[:, :2] - delta_x, bboxes[:, 2:] + delta_x], axis=1)
+    return np.maximum(0, expanded).astype(np.int64)
+
+
+def square_bboxes(img, bboxes):
+    """Batched version of `square_box`
+
+    Returns:
+        numpy.array: (N, 4) bboxes, int64 for integer inputs and float64 otherwise
+    """
+    bboxes = _as_bboxes(bboxes)
+    w, h = _get_image_size(img)
+    x, y, xx, yy = bboxes.T
+    _cx = (xx + x) / 2
+    _delta_y = (yy - y) / 2
+    squared = np.stack(
+        [
+            np.trunc(np.maximum(0, _cx - _delta_y)),
+            np.maximum(0, y),
+            np.trunc(np.minimum(w, _cx + _delta_y)),
+            yy,
+        ],
+        axis=1,
+    )
+    return squared.astype(np.result_type(bboxes.dtype, np.int64))
+
+
+def shift_bboxes(bboxes, offsets):
+    """Translate every bounding box by its own (dx, dy)
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes in default format
+        offsets (numpy.array, list): (N, 2) or (2,) offsets
+
+    Returns:
+        numpy.array: (N, 4) shifted bboxes
+    """
+    bboxes = _as_bboxes(bboxes)
+    offsets = np.asarray(offsets)
+    return bboxes + np.tile(offsets, 2)
+
+
+def random_shift_bboxes(img, bboxes, ratio=0.2):
+    """Batched version of `random_shift_box`
+
+    Every box draws its own shift, so the random stream differs from calling
+    `random_shift_box` in a loop; the distribution is the same.
+
+    Returns:
+        numpy.array: (N, 4) shifted and squared bboxes
+    """
+    bboxes = _as_bboxes(bboxes)
+    bound = (ratio * (bboxes[:, 2] - bboxes[:, 0])).astype(np.int64)
+    offsets = -np.random.randint(-bound, bound, size=(2, len(bboxes))).T
+    return square_bboxes(img, shift_bboxes(bboxes, offsets))
+
+
+def convert_bboxes_format(bboxes, src="default", dst="coco"):
+    """Convert bounding boxes between formats
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes
+        src (str, optional): input format. Defaults to "default".
+        dst (str, optional): output format. Defaults to "coco".
+            default: x, y, xx, yy
+            coco: x, y, w, h
+            cxcywh: center x, center y, w, h
+
+    Returns:
+        numpy.array: (N, 4) converted bboxes
+    """
+    assert src in BBOX_FORMATS and dst in BBOX_FORMATS
+    bboxes = _as_bboxes(bboxes)
+    if src == dst:
+        return bboxes.copy()
+
+    if src == "coco":
+        bboxes = np.concatenate([bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:]], axis=1)
+    elif src == "cxcywh":
+        half_wh = bboxes[:, 2:] / 2
+        bboxes = np.concatenate([bboxes[:, :2] - half_wh, bboxes[:, :2] + half_wh], axis=1)
+
+    if dst == "coco":
+        return np.concatenate([bboxes[:, :2], bboxes[:, 2:] - bboxes[:, :2]], axis=1)
+    elif dst == "cxcywh":
+        return np.concatenate(
+            [(bboxes[:, :2] + bboxes[:, 2:]) / 2, bboxes[:, 2:] - bboxes[:, :2]], axis=1
+        )
+    return bboxes
+
+
+# ===============================================================================
+# Non-maximum suppression and box matching
+# ===============================================================================
+
+
+def _iou_one_to_many(bbox, bboxes, areas, area):
+    inter_w = np.minimum(bbox[2], bboxes[:, 2]) - np.maximum(bbox[0], bboxes[:, 0])
+    inter_h = np.minimum(bbox[3], bboxes[:, 3]) - np.maximum(bbox[1], bboxes[:, 1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    union = area + areas - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def nms(bboxes, scores, iou_threshold=0.5, score_threshold=None, max_outputs=None):
+    """Greedy non-maximum suppression
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes in default format
+        scores (numpy.array, list): (N,) confidence scores
+        iou_threshold (float, optional): boxes overlapping a kept box with
+            IoU > iou_threshold are suppressed. Defaults to 0.5.
+        score_threshold (float, optional): drop boxes below this score first. Defaults to None.
+        max_outputs (int, optional): stop after keeping this many boxes. Defaults to None.
+
+    Returns:
+        numpy.array: int64 indices of the kept boxes, sorted by decreasing score
+    """
+    bboxes = _as_bboxes(bboxes).astype(np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    assert len(scores) == len(bboxes), "bboxes and scores should have the same length."
+
+    order = np.argsort(-scores, kind="stable")
+    if score_threshold is not None:
+        order = order[scores[order] >= score_threshold]
+    areas = compute_bboxes_area(bboxes)
+
+    keep = []
+    while order.size > 0 and (max_outputs is None or len(keep) < max_outputs):
+        idx = order[0]
+        keep.append(idx)
+        rest = order[1:]
+        ious = _iou_one_to_many(bboxes[idx], bboxes[rest], areas[rest], areas[idx])
+        order = rest[ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def batched_nms(
+    bboxes, scores, class_ids, iou_threshold=0.5, score_threshold=None, max_outputs=None
+):
+    """Class-aware non-maximum suppression
+
+    Boxes of different classes never suppress each other. All classes are handled in a
+    single `nms` call by offsetting every class into its own disjoint coordinate range.
+
+    Args:
+        class_ids (numpy.array, list): (N,) integer class of every box
+
+    Returns:
+        numpy.array: int64 indices of the kept boxes, sorted by decreasing score
+    """
+    bboxes = _as_bboxes(bboxes).astype(np.float64)
+    class_ids = np.asarray(class_ids)
+    assert len(class_ids) == len(bboxes), "bboxes and class_ids should have the same length."
+    if len(bboxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = (class_ids - class_ids.min()) * (bboxes.max() - bboxes.min() + 1)
+    return nms(
+        bboxes + offsets[:, None],
+        scores,
+        iou_threshold=iou_threshold,
+        score_threshold=score_threshold,
+        max_outputs=max_outputs,
+    )
+
+
+def soft_nms(
+    bboxes, scores, iou_threshold=0.3, sigma=0.5, score_threshold=0.001, method="gaussian"
+):
+    """Soft non-maximum suppression (Bodla et al., 2017)
+
+    Instead of removing overlapping boxes, their scores are decayed.
+
+    Args:
+        bboxes (numpy.array, list): (N, 4) bboxes in default format
+        scores (numpy.array, list): (N,) confidence scores
+        iou_threshold (float, optional): overlap where the linear decay starts. Defaults to 0.3.
+        sigma (float, optional): gaussian decay parameter. Defaults to 0.5.
+        score_threshold (float, optional): minimum decayed score kept. Defaults to 0.001.
+        method (str, optional): "gaussian", "linear" or "hard". Defaults to "gaussian".
+
+    Returns:
+        tuple: kept indices sorted by decreasing decayed score, decayed scores of those boxes
+    """
+    assert method in ["gaussian", "linear", "hard"]
+    bboxes = _as_bboxes(bboxes).astype(np.float64)
+    scores = np.array(scores, dtype=np.float64)
+    assert len(scores) == len(bboxes), "bboxes and scores should have the same length."
+
+    areas = compute_bboxes_area(bboxes)
+    remaining = np.flatnonzero(scores >= score_threshold)
+    keep = []
+    keep_scores = []
+    while remaining.size > 0:
+        top = np.argmax(scores[remaining])
+        idx = remaining[top]
+        keep.append(idx)
+        keep_scores.append(scores[idx])
+        remaining = np.delete(remaining, top)
+
+        ious = _iou_one_to_many(bboxes[idx], bboxes[remaining], areas[remaining], areas[idx])
+        if method == "gaussian":
+            decay = np.exp(-(ious**2) / sigma)
+        elif method == "linear":
+            decay = np.where(ious > iou_threshold, 1 - ious, 1.0)
+        else:
+            decay = np.where(ious > iou_threshold, 0.0, 1.0)
+        scores[remaining] *= decay
+        remaining = remaining[scores[remaining] >= score_threshold]
+    return np.array(keep, dtype=np.int64), np.array(keep_scores, dtype=np.float64)
+
+
+def match_bboxes(bboxes_a, bboxes_b, iou_threshold=0.5, method="greedy"):
+    """Match two sets of bounding boxes on their IoU
+
+    Args:
+        bboxes_a (numpy.array, list): (N, 4) bboxes in default format, e.g. predictions
+        bboxes_b (numpy.array, list): (M, 4) bboxes in default format, e.g. ground truths
+        iou_threshold (float, optional): minimum IoU of a valid match. Defaults to 0.5.
+        method (str, optional): matching strategy. Defaults to "greedy".
+            greedy: repeatedly take the highest-IoU pair whose boxes are both free
+            hungarian: maximize the total IoU (requires `scipy`)
+
+    Returns:
+        tuple: (K, 2) matched index pairs, unmatched indices of a, unmatched indices of b
+    """
+    assert method in ["greedy", "hungarian"]
+    iou = compute_iou_matrix(bboxes_a, bboxes_b)
+    n, m = iou.shape
+
+    if method == "greedy":
+        rows, cols = np.nonzero(iou >= iou_threshold)
+        order = np.argsort(-iou[rows, cols], kind="stable")
+        used_a = np.zeros(n, dtype=bool)
+        used_b = np.zeros(m, dtype=bool)
+        matches = []
+        for row, col in zip(rows[order], cols[order]):
+            if not used_a[row] and not used_b[col]:
+                used_a[row] = used_b[col] = True
+                matches.append((row, col))
+    else:
+        try:
+            from scipy.optimize import linear_sum_assignment
+        except ImportError as e:
+            raise ImportError(
+                "No package `scipy`, cannot execute `match_bboxes` with `hungarian`."
+            ) from e
+        rows, cols = linear_sum_assignment(-iou)
+        valid = iou[rows, cols] >= iou_threshold
+        matches = list(zip(rows[valid], cols[valid]))
+
+    matches = np.array(matches, dtype=np.int64).reshape(-1, 2)
+    unmatched_a = np.setdiff1d(np.arange(n), matches[:, 0])
+    unmatched_b = np.setdiff1d(np.arange(m), matches[:, 1])
+    return matches, unmatched_a, unmatched_b
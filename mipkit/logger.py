@@ -22,8 +22,14 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+import atexit
+import json
 import logging
+import multiprocessing
+import os
+import queue
 import warnings
+from logging.handlers import QueueHandler, QueueListener
 
 try:
     from termcolor import colored, cprint
@@ -31,16 +37,237 @@ except ImportError as e:
     warnings.warn(e.msg)
 
 
-def get_logger():
-    logger = logging.getLogger()
-    logger.setLevel(level=logging.INFO)
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    ch = logging.StreamHandler()
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_LEVEL_COLORS = {
+    logging.DEBUG: "blue",
+    logging.INFO: "green",
+    logging.WARNING: "yellow",
+    logging.ERROR: "red",
+    logging.CRITICAL: "red",
+}
+
+_LISTENER = None
+_QUEUE_HANDLER = None
+PRINT_LOGGER = "mipkit.print"
+
+
+def _is_mipkit_handler(handler):
+    return getattr(handler, "_mipkit", False)
+
+
+def _install_handler(logger, handler):
+    # Replace the handlers installed by a previous call instead of piling them up
+    for h in [h for h in logger.handlers if _is_mipkit_handler(h)]:
+        logger.removeHandler(h)
+    handler._mipkit = True
+    logger.addHandler(handler)
+
+
+def _remove_named_handlers():
+    # Named loggers set up by `get_logger` would print their records a second time
+    for logger in list(logging.root.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger):
+            for h in [h for h in logger.handlers if _is_mipkit_handler(h)]:
+                logger.removeHandler(h)
+
+
+def get_logger(name=None, level=logging.INFO, fmt=DEFAULT_FORMAT):
+    """Get a logger writing to stderr
+
+    Calling it several times installs a single handler, and no handler is added
+    when the records already reach one installed by `setup_async_logging`.
+
+    Args:
+        name (str, optional): logger name, None for the root logger. Defaults to None.
+        level (int, optional): logging level. Defaults to logging.INFO.
+        fmt (str, optional): record format. Defaults to DEFAULT_FORMAT.
+
+    Returns:
+        logging.Logger: the logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level=level)
+    root = logging.getLogger()
+    if not any(_is_mipkit_handler(h) for h in logger.handlers + root.handlers):
+        ch = logging.StreamHandler()
+        ch.setFormatter(logging.Formatter(fmt))
+        _install_handler(logger, ch)
     return logger
 
 
+# ===============================================================================
+# Asynchronous logging
+# ===============================================================================
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line
+
+    Fields passed with `extra={"data": {...}}` are merged into the object.
+    """
+
+    FIELDS = ("name", "levelname", "process", "processName", "threadName", "module", "lineno")
+
+    def format(self, record):
+        payload = {"time": self.formatTime(record, self.datefmt), "message": record.getMessage()}
+        payload.update((f, getattr(record, f, None)) for f in self.FIELDS)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        payload.update(getattr(record, "data", None) or {})
+        return json.dumps(payload, default=str)
+
+
+class ColorFormatter(logging.Formatter):
+    """Color the formatted record by its level, as `print_info` and friends do"""
+
+    def format(self, record):
+        return colored(super().format(record), _LEVEL_COLORS.get(record.levelno, "white"))
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    `QueueHandler.prepare` merges the message arguments in the logging thread so
+    the record can be pickled. Records sent to an in-process queue are never
+    pickled, so with `lazy=True` they are enqueued untouched and all formatting
+    happens in the background. Arguments must then not be mutated after the call.
+    """
+
+    def __init__(self, queue, lazy=True):
+        super().__init__(queue)
+        self.lazy = lazy
+
+    def prepare(self, record):
+        if self.lazy:
+            return record
+        return super().prepare(record)
+
+
+def _build_handlers(log_file, fmt, json_format, stream, color):
+    handlers = []
+    if stream:
+        handler = logging.StreamHandler()
+        if json_format:
+            handler.setFormatter(JsonFormatter())
+        elif color:
+            handler.setFormatter(ColorFormatter(fmt))
+        else:
+            handler.setFormatter(logging.Formatter(fmt))
+        handlers.append(handler)
+    if log_file is not None:
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(fmt))
+        handlers.append(handler)
+    return handlers
+
+
+def setup_async_logging(
+    log_file=None,
+    level=logging.INFO,
+    fmt=DEFAULT_FORMAT,
+    json_format=False,
+    stream=True,
+    color=False,
+    multiprocess=False,
+    print_level=logging.DEBUG,
+):
+    """Route every record through a queue to a background writer thread
+
+    The root logger only enqueues records; a `QueueListener` thread formats them
+    and does the I/O. Calling it again replaces the previous setup, and the
+    handlers added by `get_logger` are removed so records are not printed twice.
+    With `multiprocess=True` the queue is a `multiprocessing.Queue`: forked workers
+    keep sending their records to it, other workers need `setup_worker_logging`,
+    and all of them end up in the same stream and `log_file`. Otherwise the queue
+    only lives in this process: forked children drop it and log as if
+    `setup_async_logging` had never been called.
+
+    Usage:
+        log_queue = setup_async_logging("train.log", json_format=True, multiprocess=True)
+        with Pool(4, initializer=setup_worker_logging, initargs=(log_queue,)) as pool:
+            ...
+
+    Args:
+        log_file (str, optional): file to append the records to. Defaults to None.
+        level (int, optional): root logging level. Defaults to logging.INFO.
+        fmt (str, optional): record format. Defaults to DEFAULT_FORMAT.
+        json_format (bool, optional): write JSON lines instead of `fmt`. Defaults to False.
+        stream (bool, optional): write to stderr. Defaults to True.
+        color (bool, optional): color stderr lines by level. Defaults to False.
+        multiprocess (bool, optional): use a queue shared with worker processes.
+            Defaults to False.
+        print_level (int, optional): level of the `print_*` helpers, which log to
+            their own "mipkit.print" logger. Defaults to logging.DEBUG, i.e. they
+            print everything as before, whatever the root level.
+
+    Returns:
+        queue.SimpleQueue | multiprocessing.Queue: the log queue
+    """
+    global _LISTENER, _QUEUE_HANDLER
+    stop_async_logging()
+
+    log_queue = multiprocessing.Queue(-1) if multiprocess else queue.SimpleQueue()
+    handlers = _build_handlers(log_file, fmt, json_format, stream, color)
+    _LISTENER = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+
+    _QUEUE_HANDLER = _QueueHandler(log_queue, lazy=not multiprocess)
+    root = logging.getLogger()
+    root.setLevel(level)
+    logging.getLogger(PRINT_LOGGER).setLevel(print_level)
+    _remove_named_handlers()
+    _install_handler(root, _QUEUE_HANDLER)
+    return log_queue
+
+
+def setup_worker_logging(log_queue, level=logging.INFO, print_level=logging.DEBUG):
+    """Send the records of a worker process to the queue of `setup_async_logging`"""
+    global _QUEUE_HANDLER
+    _QUEUE_HANDLER = _QueueHandler(log_queue, lazy=False)
+    root = logging.getLogger()
+    root.setLevel(level)
+    logging.getLogger(PRINT_LOGGER).setLevel(print_level)
+    _remove_named_handlers()
+    _install_handler(root, _QUEUE_HANDLER)
+
+
+def _reset_after_fork():
+    # The writer thread only runs in the parent: a forked child must never stop it,
+    # and records put in an in-process queue would never be read
+    global _LISTENER, _QUEUE_HANDLER
+    _LISTENER = None
+    if _QUEUE_HANDLER is not None and _QUEUE_HANDLER.lazy:
+        logging.getLogger().removeHandler(_QUEUE_HANDLER)
+        _QUEUE_HANDLER = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def stop_async_logging():
+    """Flush the queue, stop the writer thread and close its handlers"""
+    global _LISTENER, _QUEUE_HANDLER
+    if _QUEUE_HANDLER is not None:
+        logging.getLogger().removeHandler(_QUEUE_HANDLER)
+        _QUEUE_HANDLER = None
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        for handler in _LISTENER.handlers:
+            handler.close()
+        _LISTENER = None
+
+
+atexit.register(stop_async_logging)
+
+
+# ===============================================================================
+# Printing
+# ===============================================================================
+
+
 def mprint(*args):
     return " ".join(map(str, *args))
 
@@ -57,21 +284,36 @@ def turn_green(message):
     return colored(message, "green")
 
 
+class _Message:
+    # Joins the arguments only when the record is formatted
+    __slots__ = ("args",)
+
+    def __init__(self, args):
+        self.args = args
+
+    def __str__(self):
+        return mprint(self.args)
+
+
+def _print(level, tag, color, args):
+    if _QUEUE_HANDLER is not None:
+        # stacklevel: report the caller of `print_*`, not this module
+        logging.getLogger(PRINT_LOGGER).log(level, "%s", _Message(args), stacklevel=3)
+    else:
+        cprint(f"[{tag}] " + mprint(args), color=color)
+
+
 def print_warning(*args):
-    message = mprint(args)
-    cprint("[WARNING] " + message, color="yellow")
+    _print(logging.WARNING, "WARNING", "yellow", args)
 
 
 def print_info(*args):
-    message = mprint(args)
-    cprint("[INFO] " + message, color="green")
+    _print(logging.INFO, "INFO", "green", args)
 
 
 def print_error(*args):
-    message = mprint(args)
-    cprint("[ERROR] " + message, color="red")
+    _print(logging.ERROR, "ERROR", "red", args)
 
 
 def print_debug_note(*args):
-    message = mprint(args)
-    cprint("[DEBUG] " + message, color="blue")
+    _print(logging.DEBUG, "DEBUG", "blue", args)
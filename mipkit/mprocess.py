@@ -23,7 +23,15 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
 import warnings
+from collections import Counter
 from multiprocessing import Pool, cpu_count
 from multiprocessing.pool import ThreadPool
 
@@ -41,6 +49,8 @@ def pool_worker(
     verbose=True,
     tqdm_desc="",
     tqdm_pos=0,
+    profile=None,
+    sample_interval=0.005,
 ):
     """Run target function in multi-process
 
@@ -57,11 +67,29 @@ def pool_worker(
     verbose: bool
         True: progress bar
         False: silent
+    profile: str
+        None: no profiling
+        "cprofile": cProfile every item and merge the stats of all workers
+        "sample": sample the stack of every item every `sample_interval` seconds
+    sample_interval: float
+        seconds between two stack samples in "sample" mode
 
     Returns
     -------
-    list of output of func
+    list of output of func, or (list of output of func, PoolProfile) when profiling
     """
+    if profile is not None:
+        return _profiled_pool_worker(
+            target,
+            inputs,
+            use_thread,
+            num_worker,
+            verbose,
+            tqdm_desc,
+            tqdm_pos,
+            profile,
+            sample_interval,
+        )
     if use_thread:
         pool_use = ThreadPool
     else:
@@ -89,3 +117,259 @@ def pool_worker(
         else:
             res = [target(_input) for _input in inputs]
     return res
+
+
+# ===============================================================================
+# Profiling
+# ===============================================================================
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# One sampler thread per interval and per process
+_SAMPLERS = {}
+_SAMPLER_LOCK = threading.Lock()
+
+
+class _StackSampler(threading.Thread):
+    """Background thread sampling the stacks of the registered threads"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stacks = {}
+        self.start()
+
+    def register(self, ident):
+        with self._lock:
+            self._stacks[ident] = Counter()
+
+    def unregister(self, ident):
+        with self._lock:
+            return self._stacks.pop(ident)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._stacks:
+                    continue
+                frames = sys._current_frames()
+                for ident, counter in self._stacks.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[_collapse_stack(frame)] += 1
+
+
+def _get_sampler(interval):
+    with _SAMPLER_LOCK:
+        sampler = _SAMPLERS.get(interval)
+        if sampler is None or not sampler.is_alive():
+            sampler = _SAMPLERS[interval] = _StackSampler(interval)
+    return sampler
+
+
+def _reset_samplers():
+    # Threads do not survive a fork and their locks may have been held during it
+    global _SAMPLER_LOCK
+    _SAMPLER_LOCK = threading.Lock()
+    _SAMPLERS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_samplers)
+
+
+def _collapse_stack(frame):
+    # Frames below the profiling wrapper, root first, in the collapsed stack format
+    names = []
+    while frame is not None and frame.f_code is not _ProfiledTarget.__call__.__code__:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _RawStats:
+    # What `pstats.Stats` expects from a profiler
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class _ProfiledTarget:
+    def __init__(self, target, mode, sample_interval):
+        self.target = target
+        self.mode = mode
+        self.sample_interval = sample_interval
+
+    def __call__(self, item):
+        index, submit_time, _input = item
+        start_time = time.time()
+        ident = threading.get_ident()
+        stats = stacks = None
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = _get_sampler(self.sample_interval)
+            sampler.register(ident)
+        start = time.perf_counter()
+        try:
+            result = self.target(_input)
+        finally:
+            compute = time.perf_counter() - start
+            if self.mode == "cprofile":
+                profiler.disable()
+                profiler.create_stats()
+                stats = profiler.stats
+            else:
+                stacks = sampler.unregister(ident)
+        record = {
+            "index": index,
+            "worker": f"{os.getpid()}:{threading.current_thread().name}",
+            "wait": start_time - submit_time,
+            "compute": compute,
+            "end_time": time.time(),
+        }
+        return result, record, stats, stacks
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class PoolProfile:
+    """Profile of a `pool_worker` job, merged from all its workers
+
+    Every item records its queue wait (from submission to the start of its
+    computation), its compute time and its transfer time (from the end of its
+    computation to its reception in the parent, i.e. result pickling and IPC).
+    """
+
+    def __init__(self, mode):
+        assert mode in PROFILE_MODES, f"profile should be one of {PROFILE_MODES}"
+        self.mode = mode
+        self.records = []
+        self.stacks = Counter()
+        self.stats = None
+        self.wall_time = 0.0
+
+    def add(self, output):
+        result, record, stats, stacks = output
+        record["transfer"] = time.time() - record.pop("end_time")
+        self.records.append(record)
+        if stats is not None:
+            if self.stats is None:
+                self.stats = pstats.Stats(_RawStats(stats))
+            else:
+                self.stats.add(_RawStats(stats))
+        if stacks:
+            self.stacks.update(stacks)
+        return result
+
+    def worker_table(self):
+        """Per worker: items, compute, mean wait and transfer, busy fraction of the wall time"""
+        workers = {}
+        for r in self.records:
+            w = workers.setdefault(
+                r["worker"], {"items": 0, "compute": 0.0, "wait": 0.0, "transfer": 0.0}
+            )
+            w["items"] += 1
+            w["compute"] += r["compute"]
+            w["wait"] += r["wait"]
+            w["transfer"] += r["transfer"]
+        for w in workers.values():
+            w["wait"] /= w["items"]
+            w["transfer"] /= w["items"]
+            w["busy"] = w["compute"] / max(self.wall_time, 1e-9)
+        return workers
+
+    def to_dict(self):
+        computes = sorted(r["compute"] for r in self.records)
+        num_items = max(len(self.records), 1)
+        return {
+            "mode": self.mode,
+            "items": len(self.records),
+            "wall_time": self.wall_time,
+            "compute_p50": _percentile(computes, 0.5),
+            "compute_p95": _percentile(computes, 0.95),
+            "compute_p99": _percentile(computes, 0.99),
+            "mean_wait": sum(r["wait"] for r in self.records) / num_items,
+            "mean_transfer": sum(r["transfer"] for r in self.records) / num_items,
+            "workers": self.worker_table(),
+        }
+
+    def collapsed_stacks(self):
+        """Sampled stacks in the collapsed format of flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def save_collapsed_stacks(self, path):
+        with open(path, "w") as f:
+            f.write(self.collapsed_stacks() + "\n")
+        return path
+
+    def summary(self, top=15, sort_key="cumulative"):
+        info = self.to_dict()
+        lines = [
+            f"> {info['items']} items in {info['wall_time']:.3f}s, compute p50/p95/p99: "
+            f"{info['compute_p50'] * 1e3:.2f}/{info['compute_p95'] * 1e3:.2f}/"
+            f"{info['compute_p99'] * 1e3:.2f} ms, mean wait: {info['mean_wait'] * 1e3:.2f} ms, "
+            f"mean transfer: {info['mean_transfer'] * 1e3:.2f} ms",
+            f"{'worker':<32}{'items':>8}{'compute (s)':>13}{'wait (ms)':>11}"
+            f"{'transfer (ms)':>15}{'busy':>7}",
+        ]
+        for name, w in sorted(info["workers"].items()):
+            lines.append(
+                f"{name[:31]:<32}{w['items']:>8}{w['compute']:>13.3f}{w['wait'] * 1e3:>11.2f}"
+                f"{w['transfer'] * 1e3:>15.2f}{w['busy']:>7.0%}"
+            )
+        if self.stats is not None:
+            stream = io.StringIO()
+            self.stats.stream = stream
+            self.stats.sort_stats(sort_key).print_stats(top)
+            lines.append(stream.getvalue().strip("\n"))
+        if self.stacks:
+            total = sum(self.stacks.values())
+            lines.append(f"{'samples':>8}  top stacks")
+            for stack, count in self.stacks.most_common(top):
+                lines.append(f"{count / total:>8.1%}  {stack[-90:]}")
+        return "\n".join(lines)
+
+
+def _profiled_pool_worker(
+    target, inputs, use_thread, num_worker, verbose, tqdm_desc, tqdm_pos, mode, sample_interval
+):
+    # Items are dispatched one at a time and collected unordered, so that wait and
+    # transfer times are not inflated by chunking or by waiting for earlier items
+    report = PoolProfile(mode)
+    if num_worker is None:
+        num_worker = cpu_count()
+    if mode == "cprofile" and use_thread and num_worker != 1 and sys.version_info >= (3, 12):
+        # since 3.12 cProfile relies on sys.monitoring, one profiler at a time
+        raise ValueError(
+            'profile="cprofile" cannot profile concurrent threads on Python 3.12+, '
+            'use profile="sample" with use_thread=True'
+        )
+    wrapped = _ProfiledTarget(target, mode, sample_interval)
+    stamped = ((i, time.time(), _input) for i, _input in enumerate(inputs))
+    res = [None] * len(inputs)
+    start_time = time.time()
+    progress = tqdm(total=len(inputs), desc=tqdm_desc, position=tqdm_pos, disable=not verbose)
+    if num_worker != 1:
+        pool_use = ThreadPool if use_thread else Pool
+        with pool_use(num_worker) as p:
+            for output in p.imap_unordered(wrapped, stamped):
+                res[output[1]["index"]] = report.add(output)
+                progress.update()
+    else:
+        for output in map(wrapped, stamped):
+            res[output[1]["index"]] = report.add(output)
+            progress.update()
+    progress.close()
+    report.wall_time = time.time() - start_time
+    return res, report
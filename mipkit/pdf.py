@@ -2,17 +2,20 @@ import argparse
 import os
 import re
 import sys
+import time
+import warnings
+from glob import glob
 
-import pkg_resources
-import six
 from tqdm import tqdm
 
-from .helpers import install_and_import
+from .mprocess import pool_worker
 
-install_and_import("PyDF2", required_version='2.12.1')
-from PyPDF2 import PdfFileReader, PdfFileWriter
-from PyPDF2.generic import FloatObject
-from PyPDF2 import PageObject
+try:
+    # Requires PyPDF2==2.12.1 (pip install PyPDF2==2.12.1)
+    from PyPDF2 import PageObject, PdfFileReader, PdfFileWriter
+    from PyPDF2.generic import FloatObject
+except ImportError as e:
+    warnings.warn(e.msg)
 
 __VERSION__ = "1.1.0"
 
@@ -25,26 +28,42 @@ def existance_verify(pdf_path) -> bool:
     return os.path.isfile(pdf_path)
 
 
-def expand_margin(path_to_load, path_to_save=None, expected_margin=100, overwrite=False):
+def expand_margin(
+    path_to_load, path_to_save=None, expected_margin=100, overwrite=False, verbose=True
+):
+    """Add a blank margin on both sides of every page of a PDF
+
+    Args:
+        path_to_load (str): input PDF
+        path_to_save (str, optional): output PDF. Defaults to None, i.e. next to the
+            input with an `_expanded` suffix, or the input itself when `overwrite`.
+        expected_margin (float, optional): margin width in points. Defaults to 100.
+        overwrite (bool, optional): replace the input file. Defaults to False.
+        verbose (bool, optional): print messages and a progress bar. Defaults to True.
+
+    Returns:
+        tuple: saved path, number of pages
+    """
     folder_dir = os.path.dirname(path_to_load)
     filename = os.path.basename(path_to_load)
     base_filename, ext = os.path.splitext(filename)
 
-    if not overwrite:
-        new_filename = base_filename + "_expanded" + ext
-    else:
-        new_filename = filename
-    path_to_save = os.path.join(folder_dir, new_filename)
+    if path_to_save is None:
+        if not overwrite:
+            new_filename = base_filename + "_expanded" + ext
+        else:
+            new_filename = filename
+        path_to_save = os.path.join(folder_dir, new_filename)
 
-    print("> Expand the margin for `{}`".format(filename))
+    if verbose:
+        print("> Expand the margin for `{}`".format(filename))
 
     with open(path_to_load, "rb") as f:
         p = PdfFileReader(f)
-        info = p.getDocumentInfo()
         number_of_pages = p.getNumPages()
 
         writer = PdfFileWriter()
-        for i in tqdm(range(number_of_pages)):
+        for i in tqdm(range(number_of_pages), disable=not verbose):
             page = p.getPage(i)
 
             new_page = writer.addBlankPage(
@@ -59,18 +78,110 @@ def expand_margin(path_to_load, path_to_save=None, expected_margin=100, overwrit
             bbox[0] = FloatObject(float(bbox[0]) - expected_margin)
             bbox[2] = FloatObject(float(bbox[2]) - expected_margin)
 
-            # page.scaleTo(int(page.mediaBox.getWidth()),
-            #              int(page.mediaBox.getHeight()))
+        # Write to a temporary file first, so overwriting the input is safe
+        tmp_path = path_to_save + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f_out:
+                writer.write(f_out)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path_to_save)
+    if verbose:
+        print("> Saved at `{}`".format(path_to_save))
+    return path_to_save, number_of_pages
+
+
+def _expand_margin_job(args):
+    path_to_load, path_to_save, expected_margin, overwrite = args
+    start_time = time.perf_counter()
+    try:
+        path_to_save, number_of_pages = expand_margin(
+            path_to_load, path_to_save, expected_margin, overwrite, verbose=False
+        )
+        error = None
+    except Exception as e:
+        path_to_save, number_of_pages, error = None, 0, f"{type(e).__name__}: {e}"
+    return {
+        "path": path_to_load,
+        "output": path_to_save,
+        "pages": number_of_pages,
+        "seconds": time.perf_counter() - start_time,
+        "error": error,
+    }
 
-            # new_page.mergeScaledTranslatedPage(page, scale=1,
-            #                                    tx=expected_margin,
-            #                                    ty=expected_margin)
 
-            # writer.addPage(new_page)
+def expand_margins(
+    paths_to_load,
+    output_dir=None,
+    expected_margin=100,
+    overwrite=False,
+    num_worker=None,
+    verbose=True,
+):
+    """Expand the margins of many PDFs across a process pool
 
-        with open(path_to_save, "wb") as f:
-            writer.write(f)
-    print("> Saved at `{}`".format(path_to_save))
+    Every worker handles whole documents, so a single document at a time is held
+    in memory per worker. Failures are reported instead of stopping the batch.
+
+    Args:
+        paths_to_load (list): input PDFs
+        output_dir (str, optional): folder for the outputs, keeping the paths of the
+            inputs relative to their common folder. Defaults to None, see `expand_margin`.
+        num_worker (int, optional): number of processes. Defaults to None, i.e. all CPUs.
+        verbose (bool, optional): progress bar and throughput summary. Defaults to True.
+
+    Returns:
+        list: one dict per PDF with path, output, pages, seconds and error
+
+    Raises:
+        ValueError: when several inputs would be saved to the same output
+    """
+    outputs = [None] * len(paths_to_load)
+    if output_dir is not None and paths_to_load:
+        abs_paths = [os.path.abspath(path) for path in paths_to_load]
+        root = os.path.commonpath([os.path.dirname(path) for path in abs_paths])
+        outputs = [os.path.join(output_dir, os.path.relpath(path, root)) for path in abs_paths]
+        for path in outputs:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    seen = {}
+    for path, path_to_save in zip(paths_to_load, outputs):
+        if path_to_save is None:
+            base_filename, ext = os.path.splitext(path)
+            path_to_save = path if overwrite else base_filename + "_expanded" + ext
+        path_to_save = os.path.abspath(path_to_save)
+        if path_to_save in seen:
+            raise ValueError(
+                "`{}` and `{}` would both be saved to `{}`".format(
+                    seen[path_to_save], path, path_to_save
+                )
+            )
+        seen[path_to_save] = path
+
+    inputs = [
+        (path, path_to_save, expected_margin, overwrite)
+        for path, path_to_save in zip(paths_to_load, outputs)
+    ]
+
+    start_time = time.perf_counter()
+    results = pool_worker(
+        _expand_margin_job, inputs, num_worker=num_worker, verbose=verbose, tqdm_desc="PDFs"
+    )
+    elapsed = time.perf_counter() - start_time
+
+    if verbose:
+        num_pages = sum(r["pages"] for r in results)
+        failures = [r for r in results if r["error"] is not None]
+        print(
+            f"> {len(results) - len(failures)}/{len(results)} PDFs, {num_pages} pages in "
+            f"{elapsed:.2f}s ({len(results) / max(elapsed, 1e-9):.2f} PDFs/s, "
+            f"{num_pages / max(elapsed, 1e-9):.2f} pages/s)"
+        )
+        for r in failures:
+            print("> Failed `{}`: {}".format(r["path"], r["error"]))
+    return results
 
 
 def main():
@@ -84,12 +195,15 @@ def main():
     parser.add_argument(
         "-p",
         "--path",
-        required=True,
-        help="url or file/folder id (with --id) to download from",
+        nargs="+",
+        help="PDF file(s) or folder(s) of PDFs to expand",
     )
-    parser.add_argument("-o", "--output", help="output file name / path")
+    parser.add_argument("-o", "--output", help="output file name / path, or folder in batch mode")
     parser.add_argument("--margin", help="margin size to expand", default=100, type=float)
-    parser.add_argument("-q", "--quiet", action="store_true", help="Show progress bar")
+    parser.add_argument(
+        "-j", "--num-worker", help="processes in batch mode, all CPUs if unset", type=int
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="Hide progress bar")
 
     args = parser.parse_args()
 
@@ -97,20 +211,45 @@ def main():
         print(version())
         exit()
 
-    if args.path:
-        exist = existance_verify(args.path)
-        if not exist:
-            print("File not Found")
-            exit()
+    if not args.path:
+        parser.error("the following arguments are required: -p/--path")
+
+    paths = []
+    missing = []
+    for path in args.path:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob(os.path.join(path, "*.pdf"))))
+        elif existance_verify(path):
+            paths.append(path)
         else:
-            expand_margin(
-                path_to_load=args.path,
-                path_to_save=None,
+            print("File not Found: {}".format(path), file=sys.stderr)
+            missing.append(path)
+    if not paths:
+        sys.exit(1)
+
+    if len(args.path) == 1 and not os.path.isdir(args.path[0]):
+        expand_margin(
+            path_to_load=paths[0],
+            path_to_save=args.output,
+            expected_margin=args.margin,
+            overwrite=False,
+            verbose=not args.quiet,
+        )
+        failed = False
+    else:
+        try:
+            results = expand_margins(
+                paths,
+                output_dir=args.output,
                 expected_margin=args.margin,
-                overwrite=False,
+                num_worker=args.num_worker,
+                verbose=not args.quiet,
             )
-
-    # if args.folder:
+        except ValueError as e:
+            parser.error(str(e))
+        failed = any(r["error"] is not None for r in results)
+    if missing or failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2021 Cong Vo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+Provided license texts might have their own copyrights and restrictions
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import csv
+import functools
+import io
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+__all__ = ["LatencyHistogram", "Profiler", "PROFILER", "profile", "measure"]
+
+# Prometheus bucket bounds, in seconds
+PROMETHEUS_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in nanoseconds
+
+    Each power of two is split in 2**`sub_bits` buckets, so quantiles are exact up
+    to a relative error of 2**-`sub_bits` (6% for the default) while recording
+    is a couple of integer operations.
+    """
+
+    def __init__(self, sub_bits=4):
+        self.sub_bits = sub_bits
+        self.counts = {}
+        self.count = 0
+
+    def _index(self, value):
+        exp = max(value.bit_length() - self.sub_bits - 1, 0)
+        return (exp << self.sub_bits) + (value >> exp)
+
+    def _bounds(self, index):
+        exp = max((index >> self.sub_bits) - 1, 0)
+        low = (index - (exp << self.sub_bits)) << exp
+        return low, low + (1 << exp)
+
+    def add(self, value):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Approximate `q`-quantile (0 <= q <= 1), None if empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                low, high = self._bounds(index)
+                return (low + high - 1) / 2
+        return None
+
+    def cumulative_counts(self, bounds):
+        """Number of values <= each bound (bucket midpoints are used at the edges)"""
+        items = sorted((sum(self._bounds(i)) / 2, c) for i, c in self.counts.items())
+        result, seen, pos = [], 0, 0
+        for bound in bounds:
+            while pos < len(items) and items[pos][0] <= bound:
+                seen += items[pos][1]
+                pos += 1
+            result.append(seen)
+        return result
+
+
+class _Stats:
+    __slots__ = (
+        "calls", "sampled", "total_ns", "min_ns", "max_ns", "cpu_ns", "peak_bytes", "hist"
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.sampled = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.cpu_ns = 0
+        self.peak_bytes = 0
+        self.hist = LatencyHistogram()
+
+
+class Profiler:
+    """Aggregate timings of hot code paths into per-name histograms
+
+    Only every `1 / sample_rate`-th call of a name is timed (the others are only
+    counted), which keeps the overhead low enough to leave it on in production.
+    `cpu_time` adds the thread CPU time of the sampled calls, `memory` their peak
+    traced memory (this starts `tracemalloc`, which slows allocations down, and
+    nested measured calls share the same peak).
+
+    Usage:
+        profiler = Profiler(sample_rate=0.1)
+
+        @profiler.profile()
+        def preprocess(img):
+            ...
+
+        with profiler.measure("inference"):
+            model(x)
+
+        print(profiler.report())
+        profiler.to_csv("timings.csv")
+    """
+
+    def __init__(self, sample_rate=1.0, cpu_time=False, memory=False):
+        assert 0 < sample_rate <= 1
+        self.sample_every = max(int(round(1 / sample_rate)), 1)
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, _Stats())
+        return stats
+
+    def _count(self, stats):
+        # Whether this call is sampled, decided under the lock so that concurrent
+        # calls neither lose counts nor share a sample
+        with self._lock:
+            stats.calls += 1
+            calls = stats.calls
+        return self.sample_every == 1 or calls % self.sample_every == 1
+
+    def _start(self):
+        mem = None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            mem = tracemalloc.get_traced_memory()[0]
+        cpu = time.thread_time_ns() if self.cpu_time else None
+        return cpu, mem
+
+    def _stop(self, stats, elapsed, start):
+        cpu = peak = 0
+        if start is not None:
+            if start[0] is not None:
+                cpu = time.thread_time_ns() - start[0]
+            if start[1] is not None:
+                peak = tracemalloc.get_traced_memory()[1] - start[1]
+        with self._lock:
+            stats.sampled += 1
+            stats.total_ns += elapsed
+            if elapsed > stats.max_ns:
+                stats.max_ns = elapsed
+            if stats.min_ns is None or elapsed < stats.min_ns:
+                stats.min_ns = elapsed
+            stats.cpu_ns += cpu
+            if peak > stats.peak_bytes:
+                stats.peak_bytes = peak
+            stats.hist.add(elapsed)
+
+    def profile(self, name=None):
+        """Decorator timing every sampled call of the function"""
+
+        def profile_decorator(func):
+            stats = self._get_stats(name or func.__qualname__)
+            perf_counter_ns = time.perf_counter_ns
+
+            @functools.wraps(func)
+            def profile_func(*args, **kwargs):
+                if not self._count(stats):
+                    return func(*args, **kwargs)
+                start = self._start() if self.cpu_time or self.memory else None
+                t0 = perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._stop(stats, perf_counter_ns() - t0, start)
+
+            return profile_func
+
+        return profile_decorator
+
+    @contextmanager
+    def measure(self, name):
+        """Context manager timing the sampled executions of its block"""
+        stats = self._get_stats(name)
+        if not self._count(stats):
+            yield
+            return
+        start = self._start() if self.cpu_time or self.memory else None
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._stop(stats, time.perf_counter_ns() - t0, start)
+
+    def reset(self):
+        # Reset in place: decorated functions keep a reference to their stats
+        with self._lock:
+            for stats in self._stats.values():
+                stats.__init__()
+
+    # Export -------------------------------------------------------------------
+
+    def to_dict(self):
+        """Summary per name; durations in milliseconds"""
+        with self._lock:
+            items = list(self._stats.items())
+        summary = {}
+        for name, s in items:
+            if not s.sampled:
+                continue
+            hist = s.hist
+            summary[name] = {
+                "calls": s.calls,
+                "sampled": s.sampled,
+                "mean_ms": s.total_ns / s.sampled / 1e6,
+                "min_ms": s.min_ns / 1e6,
+                "p50_ms": hist.quantile(0.5) / 1e6,
+                "p95_ms": hist.quantile(0.95) / 1e6,
+                "p99_ms": hist.quantile(0.99) / 1e6,
+                "max_ms": s.max_ns / 1e6,
+                "total_ms": s.total_ns / 1e6,
+            }
+            if self.cpu_time:
+                summary[name]["cpu_mean_ms"] = s.cpu_ns / s.sampled / 1e6
+            if self.memory:
+                summary[name]["peak_mem_mb"] = s.peak_bytes / 2**20
+        return summary
+
+    def to_csv(self, path=None):
+        """Write the summary as CSV to `path` and return it as a string"""
+        summary = self.to_dict()
+        fields = ["name"] + list(next(iter(summary.values()), {}).keys())
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields)
+        writer.writeheader()
+        for name, row in summary.items():
+            writer.writerow({"name": name, **row})
+        if path is not None:
+            with open(path, "w", newline="") as f:
+                f.write(buffer.getvalue())
+        return buffer.getvalue()
+
+    def to_prometheus(self, metric="mipkit_duration_seconds"):
+        """Prometheus text exposition of the sampled durations as histograms"""
+        with self._lock:
+            items = sorted(self._stats.items())
+        lines = [
+            f"# HELP {metric} Duration of profiled code paths.",
+            f"# TYPE {metric} histogram",
+        ]
+        for name, s in items:
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            bounds = [b * 1e9 for b in PROMETHEUS_BUCKETS]
+            for bound, count in zip(PROMETHEUS_BUCKETS, s.hist.cumulative_counts(bounds)):
+                lines.append(f'{metric}_bucket{{name="{label}",le="{bound:g}"}} {count}')
+            lines.append(f'{metric}_bucket{{name="{label}",le="+Inf"}} {s.sampled}')
+            lines.append(f'{metric}_sum{{name="{label}"}} {s.total_ns / 1e9:.9f}')
+            lines.append(f'{metric}_count{{name="{label}"}} {s.sampled}')
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Human readable table of the summary"""
+        summary = self.to_dict()
+        header = f"{'name':<40}{'calls':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+        lines = [header + "  (ms)"]
+        for name, s in summary.items():
+            lines.append(
+                f"{name[:39]:<40}{s['calls']:>10}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+                f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+            )
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+def profile(name=None):
+    """`Profiler.profile` on the module-level `PROFILER`"""
+    return PROFILER.profile(name)
+
+
+def measure(name):
+    """`Profiler.measure` on the module-level `PROFILER`"""
+    return PROFILER.measure(name)
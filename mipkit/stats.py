@@ -24,6 +24,9 @@ THE SOFTWARE.
 """
 
 import warnings
+from collections import Counter
+
+from .mprocess import pool_worker
 
 try:
     import numpy as np
@@ -32,11 +35,34 @@ except ImportError as e:
     warnings.warn(e.msg)
 
 
-def show_stats(np_arr, return_stats=False, verbose=True):
+def show_stats(np_arr, return_stats=False, verbose=True, streaming=False):
+    """Show mean, max, min and median of an array
+
+    Args:
+        np_arr (numpy.array): input array
+        return_stats (bool, optional): return the stats dict. Defaults to False.
+        verbose (bool, optional): print the stats. Defaults to True.
+        streaming (bool, optional): compute everything in a single chunked pass with
+            `compute_stats`, the median being approximate. Meant for arrays that do
+            not fit in memory, e.g. memmaps. NaN propagates as in NumPy, but inf
+            values are skipped; both are counted in `num_nan` and `num_inf`.
+            Defaults to False.
+    """
     assert isinstance(np_arr, np.ndarray)
     stats = {}
-    is_bool = np_arr.dtype == np.bool
-    if not is_bool:
+    is_bool = np_arr.dtype == np.bool_
+    if not is_bool and streaming:
+        running = compute_stats(np_arr)
+        if running.num_nan > 0:
+            stats["mean"] = stats["max"] = stats["min"] = stats["median"] = np.nan
+        else:
+            stats["mean"] = running.mean
+            stats["max"] = running.max
+            stats["min"] = running.min
+            stats["median"] = running.quantile(0.5)
+        stats["num_nan"] = running.num_nan
+        stats["num_inf"] = running.num_inf
+    elif not is_bool:
         stats["mean"] = np_arr.mean()
         stats["max"] = np_arr.max()
         stats["min"] = np_arr.min()
@@ -57,3 +83,298 @@ def show_stats(np_arr, return_stats=False, verbose=True):
         print(msg)
     if return_stats:
         return stats
+
+
+# ===============================================================================
+# Streaming statistics
+# ===============================================================================
+
+
+class TDigest:
+    """Mergeable sketch of a distribution for approximate quantiles (Dunning, 2019)
+
+    Values are kept as weighted centroids. Compression is vectorized: after sorting,
+    centroids falling in the same unit interval of the arcsine scale function are
+    merged, which keeps about `delta` centroids with a finer resolution in the tails.
+    """
+
+    def __init__(self, delta=200):
+        self.delta = delta
+        self.means = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+        if total == 0:
+            self.means, self.weights = means, weights
+            return self
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.delta / np.pi * (np.arcsin(2 * q - 1) + np.pi / 2)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        return self
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, np.float64)
+        return self._compress(np.r_[self.means, values], np.r_[self.weights, weights])
+
+    def merge(self, other):
+        return self._compress(np.r_[self.means, other.means], np.r_[self.weights, other.weights])
+
+    def quantile(self, q, vmin=None, vmax=None):
+        """Approximate quantile(s) q in [0, 1], optionally clamped to the exact extremes"""
+        if len(self.means) == 0:
+            return np.nan
+        cum = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[0, cum, self.count]
+        fp = np.r_[
+            self.means[0] if vmin is None else vmin,
+            self.means,
+            self.means[-1] if vmax is None else vmax,
+        ]
+        return np.interp(np.asarray(q) * self.count, xp, fp)
+
+
+class RunningStats:
+    """One-pass, mergeable count / mean / variance / min / max / NaN / inf statistics
+
+    Chunks are summarized with NumPy and combined with the parallel variance
+    formula of Chan et al., so partial results from several workers can be merged
+    exactly. Moments, extremes and quantiles ignore NaN and inf values, which are
+    counted separately.
+
+    Usage:
+        stats = RunningStats()
+        for chunk in chunks:
+            stats.update(chunk)
+        stats.mean, stats.std, stats.quantile(0.99)
+    """
+
+    def __init__(self, delta=200):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.num_nan = 0
+        self.num_inf = 0
+        self.digest = TDigest(delta)
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count > 0 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def _combine(self, count, mean, m2, vmin, vmax):
+        if count == 0:
+            return self
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+        return self
+
+    def update(self, values):
+        values = np.asarray(values).ravel()
+        if values.dtype.kind not in "fc":
+            values = values.astype(np.float64)
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.num_nan += int(np.count_nonzero(np.isnan(values)))
+            self.num_inf += int(np.count_nonzero(np.isinf(values)))
+            values = values[finite]
+        if values.size == 0:
+            return self
+        mean = values.mean(dtype=np.float64)
+        m2 = np.square(values - mean, dtype=np.float64).sum()
+        self.digest.update(values)
+        return self._combine(values.size, mean, m2, float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        self.num_nan += other.num_nan
+        self.num_inf += other.num_inf
+        self.digest.merge(other.digest)
+        return self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    def quantile(self, q):
+        return self.digest.quantile(q, vmin=self.min, vmax=self.max)
+
+    def to_dict(self, quantiles=(0.5,)):
+        stats = {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "num_nan": self.num_nan,
+            "num_inf": self.num_inf,
+        }
+        for q in quantiles:
+            stats[f"q{q:g}"] = float(self.quantile(q))
+        return stats
+
+
+def _chunk_stats(args):
+    np_arr, start, stop = args
+    return RunningStats().update(np_arr[start:stop])
+
+
+def compute_stats(np_arr, chunk_size=2**22, num_worker=1):
+    """Compute `RunningStats` of an array chunk by chunk
+
+    Chunks are taken along the first axis, so a memmap is read piece by piece and
+    never loaded whole.
+
+    Args:
+        np_arr (numpy.array): input array, e.g. a numpy.memmap
+        chunk_size (int, optional): approximate number of elements per chunk. Defaults to 2**22.
+        num_worker (int, optional): threads summarizing chunks in parallel. Defaults to 1.
+
+    Returns:
+        RunningStats: merged statistics
+    """
+    np_arr = np_arr if np_arr.ndim > 0 else np_arr.reshape(1)
+    row_size = max(1, int(np.prod(np_arr.shape[1:])))
+    rows = max(1, chunk_size // row_size)
+    inputs = [(np_arr, start, start + rows) for start in range(0, len(np_arr), rows)]
+    if num_worker == 1:
+        partials = (_chunk_stats(_input) for _input in inputs)
+    else:
+        partials = pool_worker(
+            _chunk_stats, inputs, use_thread=True, num_worker=num_worker, verbose=False
+        )
+
+    stats = RunningStats()
+    for partial in partials:
+        stats.merge(partial)
+    return stats
+
+
+# ===============================================================================
+# Image dataset statistics
+# ===============================================================================
+
+
+def _describe_sizes(values):
+    if len(values) == 0:
+        return None
+    return {"min": int(values.min()), "max": int(values.max()), "mean": float(values.mean())}
+
+
+class ImageDatasetStats:
+    """Mergeable per-channel statistics of a collection of 8-bit images
+
+    Only per-channel 256-bin histograms and a counter of image sizes are kept, so
+    memory does not grow with the number of images. Mean and standard deviation
+    are derived exactly from the histograms.
+
+    Usage:
+        stats = compute_image_dataset_stats(paths, num_worker=16)
+        stats.mean / 255, stats.std / 255  # e.g. for torchvision Normalize
+    """
+
+    def __init__(self, num_channels=3):
+        self.num_channels = num_channels
+        self.histograms = np.zeros((num_channels, 256), dtype=np.int64)
+        self.sizes = Counter()
+        self.num_images = 0
+        self.failures = []
+
+    def update(self, img_arr):
+        assert img_arr.dtype == np.uint8, "ImageDatasetStats expects uint8 images."
+        img_arr = img_arr.reshape(img_arr.shape[0], img_arr.shape[1], -1)
+        assert img_arr.shape[2] == self.num_channels, f"expect {self.num_channels} channels."
+        for c in range(self.num_channels):
+            self.histograms[c] += np.bincount(img_arr[..., c].ravel(), minlength=256)
+        self.sizes[img_arr.shape[:2]] += 1
+        self.num_images += 1
+        return self
+
+    def merge(self, other):
+        self.histograms += other.histograms
+        self.sizes.update(other.sizes)
+        self.num_images += other.num_images
+        self.failures.extend(other.failures)
+        return self
+
+    @property
+    def num_pixels(self):
+        return int(self.histograms[0].sum())
+
+    @property
+    def mean(self):
+        return self.histograms @ np.arange(256) / max(self.num_pixels, 1)
+
+    @property
+    def std(self):
+        second_moment = self.histograms @ np.arange(256) ** 2 / max(self.num_pixels, 1)
+        return np.sqrt(np.maximum(second_moment - self.mean**2, 0))
+
+    def to_dict(self):
+        heights = np.array([h for (h, w) in self.sizes.elements()])
+        widths = np.array([w for (h, w) in self.sizes.elements()])
+        return {
+            "num_images": self.num_images,
+            "num_pixels": self.num_pixels,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "mean_normalized": (self.mean / 255).tolist(),
+            "std_normalized": (self.std / 255).tolist(),
+            "height": _describe_sizes(heights),
+            "width": _describe_sizes(widths),
+            "most_common_sizes": self.sizes.most_common(10),
+            "num_failures": len(self.failures),
+        }
+
+
+def _image_shard_stats(args):
+    from .images import read_image
+
+    paths, num_channels = args
+    stats = ImageDatasetStats(num_channels)
+    for path in paths:
+        try:
+            stats.update(read_image(path, use_cv2=True))
+        except Exception as e:
+            stats.failures.append((path, f"{type(e).__name__}: {e}"))
+    return stats
+
+
+def compute_image_dataset_stats(paths, num_worker=None, shard_size=256, verbose=True):
+    """Compute `ImageDatasetStats` over image files in parallel processes
+
+    Every worker reduces a shard of paths to one accumulator, and only those
+    accumulators are sent back and merged. Unreadable files are recorded in
+    `failures` instead of stopping the run.
+
+    Args:
+        paths (list): image file paths
+        num_worker (int, optional): number of processes. Defaults to None, i.e. all CPUs.
+        shard_size (int, optional): images per task. Defaults to 256.
+        verbose (bool, optional): progress bar over shards. Defaults to True.
+
+    Returns:
+        ImageDatasetStats: merged statistics of all images
+    """
+    shards = [(paths[i : i + shard_size], 3) for i in range(0, len(paths), shard_size)]
+    stats = ImageDatasetStats(3)
+    for partial in pool_worker(
+        _image_shard_stats, shards, num_worker=num_worker, verbose=verbose, tqdm_desc="Shards"
+    ):
+        stats.merge(partial)
+    return stats
@@ -24,12 +24,15 @@ THE SOFTWARE.
 """
 
 import argparse
+import ast
 import copy
+import functools
 import json
 import os
 import time
 import warnings
 from collections import OrderedDict
+from collections.abc import Mapping
 from datetime import datetime
 from glob import glob
 from pathlib import Path
@@ -81,20 +84,66 @@ def glob_all_files(folder_dir, ext=None, recursive=False):
         return glob(os.path.join(folder_dir, "**." + str(ext)))
 
 
-def to_categorical(y, num_classes=None, dtype="float32"):
-    y = np.array(y, dtype="int")
+def to_categorical(y, num_classes=None, dtype="float32", out=None, sparse=False, chunk_size=None):
+    """Convert class labels to one-hot vectors
+
+    Args:
+        y (array-like): integer labels of any shape (a trailing axis of size 1 is dropped)
+        num_classes (int, optional): number of classes. Defaults to max(y) + 1.
+        dtype (str, optional): output dtype, e.g. "uint8" or "bool" to save memory.
+            Defaults to "float32".
+        out (numpy.array, optional): C-contiguous buffer of the output shape and dtype to
+            write into. Defaults to None.
+        sparse (bool, optional): return a (n, num_classes) `scipy.sparse.csr_matrix`.
+            Defaults to False.
+        chunk_size (int, optional): return a generator of dense (chunk_size, num_classes)
+            blocks over the flattened labels instead. Defaults to None.
+
+    Returns:
+        numpy.array | scipy.sparse.csr_matrix | generator: one-hot encoding, equal to the
+            default dense output in every mode
+    """
+    y = np.asarray(y)
+    if not np.issubdtype(y.dtype, np.integer):
+        y = y.astype("int")
     input_shape = y.shape
     if input_shape and input_shape[-1] == 1 and len(input_shape) > 1:
         input_shape = tuple(input_shape[:-1])
     y = y.ravel()
+    # negative labels would wrap around in dense indexing and corrupt the sparse matrix
+    assert y.size == 0 or y.min() >= 0, "labels should be non-negative."
     if not num_classes:
-        num_classes = np.max(y) + 1
+        num_classes = int(np.max(y)) + 1
     n = y.shape[0]
-    categorical = np.zeros((n, num_classes), dtype=dtype)
-    categorical[np.arange(n), y] = 1
+
+    if chunk_size is not None:
+        return _iter_categorical(y, num_classes, dtype, chunk_size)
+    if sparse:
+        from scipy.sparse import csr_matrix
+
+        data = np.ones(n, dtype=dtype)
+        return csr_matrix((data, y, np.arange(n + 1)), shape=(n, num_classes))
+
     output_shape = input_shape + (num_classes,)
-    categorical = np.reshape(categorical, output_shape)
-    return categorical
+    if out is None:
+        categorical = np.zeros((n, num_classes), dtype=dtype)
+    else:
+        assert out.shape == output_shape, f"out should have shape {output_shape}"
+        assert out.dtype == np.dtype(dtype), f"out should have dtype {np.dtype(dtype)}"
+        assert out.flags.c_contiguous, "out should be C-contiguous"
+        categorical = out.reshape(n, num_classes)
+        categorical.fill(0)
+    categorical[np.arange(n), y] = 1
+    return out if out is not None else np.reshape(categorical, output_shape)
+
+
+def _iter_categorical(y, num_classes, dtype, chunk_size):
+    # One buffer per chunk: the blocks may be kept by the caller
+    for start in range(0, len(y), chunk_size):
+        labels = y[start : start + chunk_size]
+        block = np.zeros((len(labels), num_classes), dtype=dtype)
+        block[np.arange(len(labels)), labels] = 1
+        yield block
 
 
 def tqdm(*args, **kwargs):
@@ -122,19 +171,14 @@ def generate_datetime():
 class ArgSpace(dict):
 
     def __getattr__(self, attr):
-        if attr == "__getstate__":
-            return super(DD, self).__getstate__
-        elif attr == "__setstate__":
-            return super(DD, self).__setstate__
-        elif attr == "__slots__":
-            return super(DD, self).__slots__
-        return self[attr]
+        try:
+            return self[attr]
+        except KeyError:
+            raise AttributeError(attr)
 
     def __setattr__(self, attr, value):
         # Safety check to ensure consistent behavior with __getattr__.
         assert attr not in ("__getstate__", "__setstate__", "__slots__")
-        #         if attr.startswith('__'):
-        #             return super(DD, self).__setattr__(attr, value)
         self[attr] = value
 
     def __str__(self):
@@ -149,14 +193,99 @@ class ArgSpace(dict):
             z[k] = copy.deepcopy(kv, memo)
         return z
 
-    # def keys(self):
-    #     return list(self.__dict__.keys())
+    def todict(self):
+        return dict(self)
+
+
+class FrozenConfig(Mapping):
+    """Immutable mapping with attribute access, returned by `load_config`
 
-    # def values(self):
-    #     return list(self.__dict__.values())
+    Nested dictionaries are FrozenConfig too and lists become tuples, so a
+    cached config can be shared safely. Use `todict` for a mutable copy, where
+    those tuples are lists again and tuples of the original data stay tuples.
+
+    Usage:
+        config = load_config("config.yaml")
+        config.model.lr == config["model"]["lr"]
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data=()):
+        object.__setattr__(self, "_data", {k: _freeze(v) for k, v in dict(data).items()})
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __getattr__(self, attr):
+        try:
+            return self._data[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+    def __setattr__(self, attr, value):
+        raise TypeError("FrozenConfig is immutable, use `todict` for a mutable copy")
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "FrozenConfig: %s" % self.todict()
+
+    def __reduce__(self):
+        return FrozenConfig, (self.todict(),)
 
     def todict(self):
-        return self.__dict__
+        return {k: _thaw(v) for k, v in self._data.items()}
+
+
+class _FrozenList(tuple):
+    # A frozen list, told apart from the tuples of the original data by `_thaw`
+    __slots__ = ()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenConfig(value)
+    if isinstance(value, list):
+        return _FrozenList(_freeze(v) for v in value)
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, FrozenConfig):
+        return value.todict()
+    if isinstance(value, _FrozenList):
+        return [_thaw(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_thaw(v) for v in value)
+    return value
+
+
+def parse_literal(value):
+    """Parse a string holding a Python literal (number, bool, None, list, dict...)
+
+    Replaces `eval`: only literals are evaluated, any other string is returned as is.
+    """
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return value
+
+
+def _parse_literals(data):
+    if isinstance(data, dict):
+        return {k: _parse_literals(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_parse_literals(v) for v in data]
+    if isinstance(data, str):
+        return parse_literal(data)
+    return data
 
 
 def to_namespace(d, mode):
@@ -165,11 +294,7 @@ def to_namespace(d, mode):
             if isinstance(v, dict):
                 d[k] = to_namespace(v, mode)
             elif isinstance(v, str):
-                try:
-                    d[k] = eval(v)
-                except Exception as e:
-                    # TODO: Some cases cannot be eval. DEBUG later
-                    pass
+                d[k] = parse_literal(v)
 
     return argparse.Namespace(**d)
 
@@ -202,6 +327,54 @@ def load_json(file_path, to_args=False, object_hook=None):
         return data
 
 
+# libyaml's loader is several times faster than the pure Python one
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_CONFIG_CACHE = {}
+
+
+def _read_config(file_path):
+    with open(file_path, "r") as f:
+        if os.path.splitext(file_path)[1].lower() == ".json":
+            return json.load(f)
+        return yaml.load(f, Loader=_YAML_LOADER) or {}
+
+
+def load_config(file_path, parse_literals=True, use_cache=True):
+    """Load a YAML or JSON configuration file
+
+    Parsed configs are memoized by path, modification time and size, so loading
+    an unchanged file again is a dictionary lookup.
+
+    Args:
+        file_path (str): YAML file, or JSON for a `.json` extension
+        parse_literals (bool, optional): parse string values holding Python
+            literals, e.g. "[1, 2]" or "1e-3". Defaults to True.
+        use_cache (bool, optional): use the memoized config. Defaults to True.
+
+    Returns:
+        FrozenConfig: immutable, attribute-accessible config
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    key = (path, parse_literals)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if use_cache:
+        cached = _CONFIG_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    data = _read_config(path)
+    if parse_literals:
+        data = _parse_literals(data)
+    config = FrozenConfig(data)
+    _CONFIG_CACHE[key] = (signature, config)
+    return config
+
+
+def clear_config_cache():
+    _CONFIG_CACHE.clear()
+
+
 def load_yaml_config(file_path, to_dict=False, verbose=True, to_args=True, mode=1):
     """Load yaml configuration file
 
@@ -215,14 +388,12 @@ def load_yaml_config(file_path, to_dict=False, verbose=True, to_args=True, mode=
             1: user custom
 
     Returns:
-        [type]: [description]
+        dict | argparse.Namespace | ArgSpace: the config, a fresh copy on every call
     """
     assert mode in [0, 1]
     if verbose:
         print("Load yaml config file from", file_path)
-    with open(file_path, "r") as f:
-        data = yaml.load(f, Loader=yaml.FullLoader)
-    data = ArgSpace(**data)
+    data = ArgSpace(**load_config(file_path, parse_literals=False).todict())
     if to_dict:
         return data.todict()
     elif to_args:
@@ -232,12 +403,19 @@ def load_yaml_config(file_path, to_dict=False, verbose=True, to_args=True, mode=
 
 
 def timeit(verbose=True):
+    """Print the wall time of every call
+
+    For aggregated timings of hot paths (percentiles, sampling, CPU time and
+    memory), use `mipkit.profiling.profile` instead.
+    """
+
     def timeit_decorator(func):
+        @functools.wraps(func)
         def timeit_func(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             results = func(*args, **kwargs)
             if verbose:
-                print(f"The function takes {time.time() - start_time:4f} (s) to process")
+                print(f"The function takes {time.perf_counter() - start_time:4f} (s) to process")
             return results
 
         return timeit_func
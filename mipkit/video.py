@@ -1,5 +1,13 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
 import warnings
-from typing import Dict, List, Tuple
+from multiprocessing import cpu_count
+from typing import Dict, Iterator, List, Tuple
+
+from .mprocess import pool_worker
 
 try:
     import cv2
@@ -56,19 +64,539 @@ def get_frames_by_FPS(cap: "VideoCapture", fps: int = 1) -> List["ndarray"]:
 
     Args:
         cap (cv2.VideoCapture): VideoCapture instance
-        fps (int, optional): Frame per sec. Defaults to 1.
+        fps (int, optional): Frame stride, i.e. every `fps`-th frame is taken. Defaults to 1.
+            Use `iter_frames_by_FPS` to sample at a real frame rate.
 
     Returns:
         list_frames (list): List of frames
     """
     num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    return_frames = []
     frame_indexes = range(0, num_frames, fps)
-    for findex in frame_indexes:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, findex)
+    return [frame for _, frame in iter_frames_by_indexes(cap, frame_indexes)]
+
+
+# Decoding forward is cheaper than seeking as long as the gap between two
+# wanted frames is shorter than a typical keyframe interval (GOP).
+SEEK_THRESHOLD = 150
+
+
+def _decode_frames(cap, frame_indexes=None, seek_threshold=SEEK_THRESHOLD):
+    # Yield (frame_idx, BGR frame); every frame when `frame_indexes` is None
+    pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if frame_indexes is None:
+        while True:
+            has_frame, frame = cap.read()
+            if not has_frame:
+                return
+            yield pos, frame
+            pos += 1
+
+    for idx in map(int, frame_indexes):
+        if idx < pos or idx - pos > seek_threshold:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            pos = idx
+        while pos < idx:
+            if not cap.grab():
+                return
+            pos += 1
+
         has_frame, frame = cap.read()
+        if not has_frame:
+            return
+        pos += 1
+        yield idx, frame
 
+
+def iter_frames_by_indexes(
+    cap: "VideoCapture", frame_indexes: List[int], seek_threshold: int = SEEK_THRESHOLD
+) -> Iterator[Tuple[int, "ndarray"]]:
+    """Yield the frames at the given indexes
+
+    Frames between two wanted indexes are skipped with `grab()`, which decodes
+    without the copy and color conversion of `retrieve()`. The capture only seeks
+    when going backwards or when the gap is larger than `seek_threshold`, since a
+    seek restarts decoding from the previous keyframe.
+
+    Args:
+        cap (cv2.VideoCapture): VideoCapture instance
+        frame_indexes (list): increasing frame indexes
+        seek_threshold (int, optional): largest gap decoded forward. Defaults to SEEK_THRESHOLD.
+
+    Yields:
+        (frame_idx, frame): frame index and RGB frame
+    """
+    for idx, frame in _decode_frames(cap, frame_indexes, seek_threshold):
         # Convert from BGR to RGB
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return_frames.append(frame)
-    return return_frames
+        yield idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def iter_frames_by_FPS(
+    cap: "VideoCapture", target_fps: float = 1.0, seek_threshold: int = SEEK_THRESHOLD
+) -> Iterator[Tuple[int, "ndarray"]]:
+    """Sample frames at a target frame rate
+
+    Args:
+        cap (cv2.VideoCapture): VideoCapture instance
+        target_fps (float, optional): number of frames per second of video. Defaults to 1.0.
+        seek_threshold (int, optional): see `iter_frames_by_indexes`. Defaults to SEEK_THRESHOLD.
+
+    Yields:
+        (frame_idx, frame): frame index and RGB frame
+    """
+    assert target_fps > 0, "`target_fps` must be positive"
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    stride = max(1.0, video_fps / target_fps) if video_fps > 0 else 1.0
+    frame_indexes = np.unique(np.round(np.arange(0, num_frames, stride)).astype(int))
+    yield from iter_frames_by_indexes(cap, frame_indexes, seek_threshold=seek_threshold)
+
+
+# ===============================================================================
+# Streaming
+# ===============================================================================
+
+
+class _PrefetchError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _prefetch(iterable, num_prefetch):
+    """Run `iterable` on a background thread, keeping at most `num_prefetch` items ahead"""
+    buffer = queue.Queue(maxsize=num_prefetch)
+    stop = threading.Event()
+    end = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _producer():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as e:
+            _put(_PrefetchError(e))
+            return
+        _put(end)
+
+    thread = threading.Thread(target=_producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is end:
+                return
+            if isinstance(item, _PrefetchError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _process_frame(frame, size=None, to_rgb=True, out=None):
+    if size is not None:
+        frame = cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+    elif out is not None:
+        out[...] = frame
+        frame = out
+    if to_rgb:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame if out is not None else None)
+    return frame
+
+
+def iter_frames(
+    cap: "VideoCapture",
+    frame_indexes: List[int] = None,
+    size: Tuple[int, int] = None,
+    to_rgb: bool = True,
+    prefetch: int = 0,
+) -> Iterator[Tuple[int, "ndarray"]]:
+    """Stream frames from a capture one at a time
+
+    Args:
+        cap (cv2.VideoCapture): VideoCapture instance, e.g. from `load_video`
+        frame_indexes (list, optional): increasing frame indexes. Defaults to None, i.e. all frames.
+        size ((width, height), optional): resize frames on the fly. Defaults to None.
+        to_rgb (bool, optional): convert from BGR to RGB. Defaults to True.
+        prefetch (int, optional): number of frames decoded ahead on a background
+            thread. Defaults to 0, i.e. decode in the calling thread.
+
+    Yields:
+        (frame_idx, frame): frame index and frame
+    """
+    frames = (
+        (idx, _process_frame(frame, size, to_rgb))
+        for idx, frame in _decode_frames(cap, frame_indexes)
+    )
+    if prefetch > 0:
+        frames = _prefetch(frames, prefetch)
+    yield from frames
+
+
+def iter_frame_batches(
+    cap: "VideoCapture",
+    batch_size: int = 32,
+    frame_indexes: List[int] = None,
+    size: Tuple[int, int] = None,
+    to_rgb: bool = True,
+    prefetch: int = 0,
+) -> Iterator[Tuple["ndarray", "ndarray"]]:
+    """Stream frames from a capture in fixed-size batches
+
+    Frames are decoded straight into preallocated (batch_size, H, W, 3) buffers,
+    so memory stays bounded whatever the video length. A yielded batch is a view
+    into one of those buffers and is only valid until the next batch is requested:
+    with `prefetch`, the background thread refills it as soon as the iteration
+    moves on. Copy it to keep it longer.
+
+    Args:
+        cap (cv2.VideoCapture): VideoCapture instance, e.g. from `load_video`
+        batch_size (int, optional): number of frames per batch. Defaults to 32.
+        frame_indexes (list, optional): increasing frame indexes. Defaults to None, i.e. all frames.
+        size ((width, height), optional): resize frames on the fly. Defaults to None.
+        to_rgb (bool, optional): convert from BGR to RGB. Defaults to True.
+        prefetch (int, optional): number of batches decoded ahead on a background
+            thread. Defaults to 0, i.e. decode in the calling thread.
+
+    Yields:
+        (frame_indexes, batch): (n,) frame indexes and (n, H, W, 3) frames, n <= batch_size
+    """
+
+    def _batches():
+        # the batch held by the caller, `prefetch` queued ones and the one being filled
+        num_buffers = prefetch + 2 if prefetch > 0 else 1
+        buffers = []
+        indexes = np.empty(batch_size, dtype=np.int64)
+        n = 0
+        for idx, frame in _decode_frames(cap, frame_indexes):
+            if not buffers:
+                w, h = size if size is not None else (frame.shape[1], frame.shape[0])
+                buffers = [
+                    np.empty((batch_size, h, w, 3), dtype=frame.dtype) for _ in range(num_buffers)
+                ]
+            _process_frame(frame, size, to_rgb, out=buffers[0][n])
+            indexes[n] = idx
+            n += 1
+            if n == batch_size:
+                yield indexes.copy(), buffers[0]
+                buffers.append(buffers.pop(0))
+                n = 0
+        if n > 0:
+            yield indexes[:n].copy(), buffers[0][:n]
+
+    batches = _batches()
+    if prefetch > 0:
+        batches = _prefetch(batches, prefetch)
+    yield from batches
+
+
+# ===============================================================================
+# Parallel decoding
+# ===============================================================================
+
+
+def _decode_segment(args):
+    video_file, frame_indexes, size, to_rgb, func = args
+    cap = cv2.VideoCapture(video_file)
+    outputs = []
+    for idx, frame in _decode_frames(cap, frame_indexes):
+        frame = _process_frame(frame, size, to_rgb)
+        outputs.append((idx, frame if func is None else func(frame)))
+    cap.release()
+    return outputs
+
+
+def decode_video_parallel(
+    video_file: str,
+    frame_indexes: List[int] = None,
+    num_segments: int = None,
+    size: Tuple[int, int] = None,
+    to_rgb: bool = True,
+    func=None,
+    num_worker: int = None,
+    verbose: bool = False,
+) -> List[Tuple[int, "ndarray"]]:
+    """Decode a video in parallel, one time segment per worker process
+
+    The wanted frames are split into `num_segments` contiguous segments. Every
+    worker opens its own capture, seeks once to the start of its segment and then
+    decodes forward, so each segment costs a single keyframe seek.
+
+    Args:
+        video_file (str): a path to video file.
+        frame_indexes (list, optional): increasing frame indexes. Defaults to None, i.e. all frames.
+        num_segments (int, optional): number of segments. Defaults to None, i.e. `num_worker`.
+        size ((width, height), optional): resize frames on the fly. Defaults to None.
+        to_rgb (bool, optional): convert from BGR to RGB. Defaults to True.
+        func (callable, optional): picklable function applied to every frame in the
+            worker, e.g. a feature extractor; its output replaces the frame. Defaults to None.
+        num_worker (int, optional): number of processes. Defaults to None, i.e. all CPUs.
+        verbose (bool, optional): show a progress bar over segments. Defaults to False.
+
+    Returns:
+        list: (frame_idx, frame or func(frame)) in frame order
+    """
+    if frame_indexes is None:
+        cap, _, num_frames, _ = load_video(video_file)
+        cap.release()
+        frame_indexes = np.arange(num_frames)
+    frame_indexes = np.asarray(frame_indexes, dtype=np.int64)
+
+    num_worker = num_worker or cpu_count()
+    num_segments = num_segments or num_worker
+    segments = [seg for seg in np.array_split(frame_indexes, num_segments) if len(seg) > 0]
+    inputs = [(video_file, seg, size, to_rgb, func) for seg in segments]
+
+    results = pool_worker(
+        _decode_segment,
+        inputs,
+        num_worker=min(num_worker, len(inputs)) or 1,
+        verbose=verbose,
+        tqdm_desc="Decoding",
+    )
+    return [item for outputs in results for item in outputs]
+
+
+# ===============================================================================
+# Scene changes
+# ===============================================================================
+
+SIGNATURE_METHODS = ["hist", "dhash"]
+
+
+def compute_frame_signature(frame: "ndarray", method: str = "hist", bins: int = 16) -> "ndarray":
+    """Compute a cheap signature of a frame on a downscaled copy
+
+    Args:
+        frame (ndarray): (H, W, 3) frame
+        method (str, optional): signature type. Defaults to "hist".
+            hist: normalized per-channel color histogram with `bins` bins
+            dhash: 64-bit difference hash of the 9x8 grayscale thumbnail
+        bins (int, optional): histogram bins per channel. Defaults to 16.
+
+    Returns:
+        ndarray: float32 histogram or bool hash bits
+    """
+    assert method in SIGNATURE_METHODS
+    if method == "hist":
+        small = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+        hist = [cv2.calcHist([small], [c], None, [bins], [0, 256]).ravel() for c in range(3)]
+        hist = np.concatenate(hist)
+        return hist / hist.sum()
+    else:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def signature_distance(sig_a: "ndarray", sig_b: "ndarray") -> float:
+    """Distance in [0, 1] between two `compute_frame_signature` outputs of the same method"""
+    if sig_a.dtype == bool:
+        return float(np.count_nonzero(sig_a != sig_b)) / sig_a.size
+    # histograms of 3 channels, each summing to 1/3
+    return float(np.abs(sig_a - sig_b).sum()) / 2
+
+
+def iter_scene_changes(
+    cap: "VideoCapture",
+    threshold: float = 0.3,
+    method: str = "hist",
+    stride: int = 1,
+    min_interval: int = 0,
+    to_rgb: bool = True,
+) -> Iterator[Tuple[int, "ndarray"]]:
+    """Yield only the frames whose content differs from the last yielded one
+
+    The first frame is always yielded. Every following (strided) frame is compared
+    with the last yielded frame through `signature_distance`, so slow drifts are
+    caught as well as hard cuts.
+
+    Args:
+        cap (cv2.VideoCapture): VideoCapture instance, e.g. from `load_video`
+        threshold (float, optional): minimum signature distance to yield a frame. Defaults to 0.3.
+        method (str, optional): see `compute_frame_signature`. Defaults to "hist".
+        stride (int, optional): only look at every `stride`-th frame. Defaults to 1.
+        min_interval (int, optional): minimum number of frames between two yielded frames.
+            Defaults to 0.
+        to_rgb (bool, optional): convert from BGR to RGB. Defaults to True.
+
+    Yields:
+        (frame_idx, frame): frame index and frame
+    """
+    assert method in SIGNATURE_METHODS
+    frame_indexes = None
+    if stride > 1:
+        frame_indexes = range(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), stride)
+
+    last_signature = None
+    last_idx = None
+    for idx, frame in _decode_frames(cap, frame_indexes):
+        if last_idx is not None and idx - last_idx < min_interval:
+            continue
+        signature = compute_frame_signature(frame, method=method)
+        if last_signature is None or signature_distance(signature, last_signature) > threshold:
+            last_signature = signature
+            last_idx = idx
+            yield idx, _process_frame(frame, to_rgb=to_rgb)
+
+
+# ===============================================================================
+# Metadata index
+# ===============================================================================
+
+
+def _scan_video(args):
+    video_file, mtime, thumbnail_file, thumbnail_size = args
+    cap = cv2.VideoCapture(video_file)
+    metadata = {
+        "path": video_file,
+        "mtime": mtime,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "num_frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "thumbnail": None,
+    }
+    if thumbnail_file is not None:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, metadata["num_frames"] // 2)
+        has_frame, frame = cap.read()
+        if has_frame:
+            h, w = frame.shape[:2]
+            scale = thumbnail_size / max(h, w)
+            if scale < 1:
+                frame = cv2.resize(
+                    frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+                )
+            if cv2.imwrite(thumbnail_file, frame):
+                metadata["thumbnail"] = thumbnail_file
+        if metadata["thumbnail"] is None:
+            # Failed attempt, so the video is not scanned again until it changes
+            metadata["thumbnail"] = ""
+    cap.release()
+    return metadata
+
+
+class VideoMetadataIndex:
+    """Persistent index of video metadata with an optional middle-frame thumbnail cache
+
+    Entries are stored in a SQLite file keyed by absolute path and refreshed only
+    when the file modification time changes, so re-listing a library only opens
+    new or modified videos. The `thumbnail` of a record is None without
+    `thumbnail_dir`, and an empty string when no thumbnail could be written.
+
+    Usage:
+        index = VideoMetadataIndex("videos.sqlite", thumbnail_dir="thumbnails")
+        records = index.scan(glob_all_files("videos", ext="mp4"), num_worker=8)
+    """
+
+    _COLUMNS = ["path", "mtime", "width", "height", "num_frames", "fps", "thumbnail"]
+
+    def __init__(self, index_file: str, thumbnail_dir: str = None, thumbnail_size: int = 256):
+        self.index_file = index_file
+        self.thumbnail_dir = thumbnail_dir
+        self.thumbnail_size = thumbnail_size
+        if thumbnail_dir is not None:
+            os.makedirs(thumbnail_dir, exist_ok=True)
+        self.conn = sqlite3.connect(index_file)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS videos (path TEXT PRIMARY KEY, mtime REAL, width INTEGER, "
+            "height INTEGER, num_frames INTEGER, fps REAL, thumbnail TEXT)"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _thumbnail_file(self, video_file, mtime):
+        if self.thumbnail_dir is None:
+            return None
+        key = hashlib.sha1(f"{video_file}:{mtime}".encode()).hexdigest()
+        return os.path.join(self.thumbnail_dir, key + ".jpg")
+
+    def _is_fresh(self, record, mtime):
+        if record is None or record["mtime"] != mtime:
+            return False
+        if self.thumbnail_dir is not None:
+            thumbnail = record["thumbnail"]
+            return thumbnail == "" or (thumbnail is not None and os.path.isfile(thumbnail))
+        return True
+
+    def get(self, video_file: str) -> Dict:
+        """Return the indexed metadata of a video, or None if missing or outdated"""
+        video_file = os.path.abspath(video_file)
+        row = self.conn.execute("SELECT * FROM videos WHERE path = ?", (video_file,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(self._COLUMNS, row))
+        try:
+            mtime = os.path.getmtime(video_file)
+        except FileNotFoundError:
+            return None
+        if record["mtime"] != mtime:
+            return None
+        return record
+
+    def scan(
+        self,
+        video_files: List[str],
+        num_worker: int = None,
+        use_thread: bool = True,
+        verbose: bool = True,
+    ) -> List[Dict]:
+        """Return the metadata of every video, opening only new or modified files
+
+        Args:
+            video_files (list): paths to video files.
+            num_worker (int, optional): number of workers. Defaults to None, i.e. all CPUs.
+            use_thread (bool, optional): scan with threads instead of processes. Defaults to True.
+            verbose (bool, optional): show a progress bar. Defaults to True.
+
+        Returns:
+            list: one metadata dict per video, in input order
+        """
+        video_files = [os.path.abspath(f) for f in video_files]
+        mtimes = [os.path.getmtime(f) for f in video_files]
+        records = {}
+        for path, *values in self.conn.execute("SELECT * FROM videos"):
+            records[path] = dict(zip(self._COLUMNS, [path] + values))
+
+        inputs = [
+            (f, mtime, self._thumbnail_file(f, mtime), self.thumbnail_size)
+            for f, mtime in zip(video_files, mtimes)
+            if not self._is_fresh(records.get(f), mtime)
+        ]
+        if len(inputs) > 0:
+            scanned = pool_worker(
+                _scan_video,
+                inputs,
+                use_thread=use_thread,
+                num_worker=num_worker,
+                verbose=verbose,
+                tqdm_desc="Scanning",
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [[r[c] for c in self._COLUMNS] for r in scanned],
+            )
+            self.conn.commit()
+            for r in scanned:
+                old = records.get(r["path"])
+                if old is not None and old["thumbnail"] and old["thumbnail"] != r["thumbnail"]:
+                    if os.path.isfile(old["thumbnail"]):
+                        os.remove(old["thumbnail"])
+                records[r["path"]] = r
+        return [records[f] for f in video_files]
@@ -0,0 +1,194 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import librosa
+import numpy as np
+import soundfile
+
+from mipkit.audio import (
+    AudioFeatureStore,
+    StreamingMelExtractor,
+    batch_wav2mel,
+    batch_wav2mfcc,
+    get_colormap_lut,
+    get_dct_matrix,
+    iter_features_from_file,
+    render_spectrogram,
+    save_mel,
+    save_spectrograms,
+    wav2mel,
+    wav2mfcc,
+)
+
+SR = 16000
+
+
+def random_waveforms(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.uniform(-1, 1, length).astype(np.float32) for length in lengths]
+
+
+class TestBatchedFeatures(unittest.TestCase):
+
+    def setUp(self):
+        # ragged batch: every clip is padded to the longest one internally
+        self.wavs = random_waveforms([SR, SR // 2 + 123, 3 * SR, 4000])
+
+    def test_mel_matches_wav2mel(self):
+        for wav, mel in zip(self.wavs, batch_wav2mel(self.wavs, SR)):
+            expected = wav2mel(wav, SR)
+            self.assertEqual(mel.shape, expected.shape)
+            np.testing.assert_allclose(mel, expected, atol=1e-3)
+
+    def test_mfcc_matches_wav2mfcc(self):
+        for wav, mfcc in zip(self.wavs, batch_wav2mfcc(self.wavs, SR)):
+            expected = wav2mfcc(wav, SR)
+            self.assertEqual(mfcc.shape, expected.shape)
+            np.testing.assert_allclose(mfcc, expected, atol=1e-3)
+
+
+class TestStreamingFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.wav = random_waveforms([5 * SR + 321], seed=1)[0]
+        # whole-signal log-mel with a fixed reference and no clipping
+        S = librosa.feature.melspectrogram(y=self.wav, sr=SR, n_fft=1024, hop_length=512, n_mels=96)
+        self.log_S = librosa.power_to_db(S, ref=1.0, top_db=None)
+
+    def stream(self, extractor, chunk_sizes):
+        features, start = [], 0
+        for size in chunk_sizes:
+            features.append(extractor.update(self.wav[start : start + size]))
+            start += size
+        features.append(extractor.update(self.wav[start:]))
+        features.append(extractor.flush())
+        return np.concatenate(features, axis=1)
+
+    def test_random_chunks_match_whole_signal(self):
+        rng = np.random.default_rng(0)
+        extractor = StreamingMelExtractor(SR)
+        whole = self.stream(extractor, [])
+        np.testing.assert_allclose(whole, self.log_S, atol=1e-3)
+        for _ in range(5):
+            # chunks shorter and longer than a frame, including empty ones
+            chunk_sizes = rng.integers(0, 3000, 40)
+            np.testing.assert_allclose(self.stream(extractor, chunk_sizes), whole, atol=1e-4)
+
+    def test_mfcc(self):
+        extractor = StreamingMelExtractor(SR, n_mfcc=20)
+        mfcc = self.stream(extractor, [100, 5000, 7])
+        np.testing.assert_allclose(mfcc, get_dct_matrix(96, 20) @ self.log_S, atol=1e-2)
+
+    def test_from_file(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "clip.wav")
+            soundfile.write(path, self.wav, SR, subtype="FLOAT")
+            blocks = list(iter_features_from_file(path, block_duration=0.7))
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertGreater(len(blocks), 5)
+        np.testing.assert_allclose(np.concatenate(blocks, axis=1), self.log_S, atol=1e-3)
+
+
+class TestSpectrogramRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = np.random.default_rng(2).normal(-40, 10, (96, 50))
+
+    def test_render_shape_and_dtype(self):
+        img = render_spectrogram(self.spec)
+        self.assertEqual(img.shape, (96, 50, 3))
+        self.assertEqual(img.dtype, np.uint8)
+        img = render_spectrogram(self.spec, size=(640, 480))
+        self.assertEqual(img.shape, (480, 640, 3))
+
+    def test_render_orientation_and_range(self):
+        img = render_spectrogram(self.spec)
+        lut = get_colormap_lut("jet")
+        # low frequencies at the bottom, extremes at both ends of the colormap
+        row, col = np.unravel_index(self.spec.argmin(), self.spec.shape)
+        np.testing.assert_array_equal(img[95 - row, col], lut[0])
+        row, col = np.unravel_index(self.spec.argmax(), self.spec.shape)
+        np.testing.assert_array_equal(img[95 - row, col], lut[255])
+        flat = render_spectrogram(np.zeros((4, 4)))
+        np.testing.assert_array_equal(flat, np.broadcast_to(lut[0], (4, 4, 3)))
+
+    def test_jet_matches_matplotlib(self):
+        from matplotlib import colormaps
+
+        expected = colormaps["jet"].resampled(256)(np.arange(256))[:, :3]
+        np.testing.assert_allclose(get_colormap_lut("jet") / 255, expected, atol=1 / 255)
+        self.assertFalse(get_colormap_lut("jet").flags.writeable)
+
+    def test_save(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(tmp_dir, f"{i}.png") for i in range(3)]
+            save_spectrograms([self.spec] * 3, paths, num_worker=2, verbose=False)
+            img = cv2.cvtColor(cv2.imread(paths[0]), cv2.COLOR_BGR2RGB)
+            np.testing.assert_array_equal(img, render_spectrogram(self.spec))
+            save_mel(self.spec, paths[1])
+            self.assertEqual(cv2.imread(paths[1]).shape, (480, 640, 3))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestAudioFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_dir = os.path.join(self.tmp_dir, "store")
+        self.wavs = random_waveforms([SR, SR // 3, 2 * SR + 77, SR // 2], seed=3)
+        self.clips = {}
+        for i, wav in enumerate(self.wavs):
+            self.clips[i] = os.path.join(self.tmp_dir, f"{i}.wav")
+            soundfile.write(self.clips[i], wav, SR, subtype="FLOAT")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        store = AudioFeatureStore(self.store_dir)
+        computed = store.build(self.clips, num_worker=2, chunk_size=3, verbose=False)
+        self.assertEqual(computed, ["0", "1", "2", "3"])
+
+        store = AudioFeatureStore(self.store_dir)
+        self.assertEqual(len(store), 4)
+        mels = batch_wav2mel(self.wavs, SR)
+        for i, mel in enumerate(mels):
+            self.assertIn(i, store)
+            features = store.get(i, dtype=np.float32)
+            self.assertEqual(features.shape, mel.shape)
+            # stored as float16
+            np.testing.assert_allclose(features, mel, atol=0.05)
+            np.testing.assert_array_equal(store[str(i)], store[i])
+
+    def test_resume_only_new_clips(self):
+        store = AudioFeatureStore(self.store_dir)
+        store.build({i: self.clips[i] for i in (0, 1)}, num_worker=1, verbose=False)
+        expected = store.get(1, dtype=np.float32)
+
+        store = AudioFeatureStore(self.store_dir)
+        computed = store.build(self.clips, num_worker=1, verbose=False)
+        self.assertEqual(computed, ["2", "3"])
+        self.assertEqual(store.build(self.clips, num_worker=1, verbose=False), [])
+        np.testing.assert_array_equal(store.get(1, dtype=np.float32), expected)
+        mel = batch_wav2mel(self.wavs[3:], SR)[0]
+        np.testing.assert_allclose(store.get(3, dtype=np.float32), mel, atol=0.05)
+
+    def test_parameter_change_invalidates(self):
+        store = AudioFeatureStore(self.store_dir)
+        store.build(self.clips, num_worker=1, verbose=False)
+        computed = store.build({0: self.clips[0]}, n_mfcc=20, num_worker=1, verbose=False)
+        self.assertEqual(computed, ["0"])
+        self.assertEqual(list(store.keys()), ["0"])
+        self.assertEqual(store[0].shape[0], 20)
+        self.assertNotIn(1, AudioFeatureStore(self.store_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import collections
+import http.server
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from mipkit.downloaders import BulkDownloader, DownloadManifest, run_download_manifest
+
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 8), (255, 0, 0)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # Local stand-in for image hosts: /img/* images, /flaky/* fails twice with 503,
+    # /redirect/* redirects to an image, /missing/* is 404, /text/* not an image and
+    # /idle/* closes the keep-alive connection after replying, without telling
+    protocol_version = "HTTP/1.1"
+    hits = collections.Counter()
+    png = _png_bytes()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path.startswith("/flaky") and self.hits[self.path] < 3:
+            self._reply(503)
+        elif self.path.startswith("/redirect"):
+            self._reply(302, headers=[("Location", "/img/redirected")])
+        elif self.path.startswith("/missing"):
+            self._reply(404)
+        elif self.path.startswith("/text"):
+            self._reply(200, b"not an image")
+        elif self.path.startswith("/idle"):
+            self._reply(200, self.png)
+            self.close_connection = True
+        else:
+            self._reply(200, self.png)
+
+
+class _LocalServerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _Handler.hits.clear()
+        self.cache_dir = tempfile.mkdtemp()
+        self.downloader = BulkDownloader(self.cache_dir, num_worker=4, backoff=0.01, decode=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+class TestBulkDownloader(_LocalServerTestCase):
+
+    def test_statuses(self):
+        urls = [self.base_url + path for path in ["/img/0", "/flaky/0", "/redirect/0"]]
+        urls += [self.base_url + "/missing/0", self.base_url + "/text/0"]
+        results = self.downloader.download(urls, verbose=False)
+        statuses = [r["status"] for r in results]
+        self.assertEqual(statuses, ["done", "done", "done", "failed", "invalid"])
+        self.assertEqual(_Handler.hits["/flaky/0"], 3)
+        self.assertEqual(results[0]["size"], (10, 8))
+
+    def test_reconnect_closed_keep_alive(self):
+        downloader = BulkDownloader(self.cache_dir, num_worker=1, retry=0, decode=True)
+        urls = [f"{self.base_url}/idle/{i}" for i in range(6)]
+        results = downloader.download(urls, verbose=False)
+        self.assertEqual([r["status"] for r in results], ["done"] * 6)
+        self.assertEqual(sum(_Handler.hits.values()), 6)
+
+    def test_many_urls(self):
+        urls = [f"{self.base_url}/img/{i}" for i in range(50)]
+        results = self.downloader.download(urls, verbose=False)
+        self.assertEqual([r["url"] for r in results], urls)
+        self.assertTrue(all(r["status"] == "done" for r in results))
+
+    def test_cache_and_dedup(self):
+        urls = [f"{self.base_url}/img/{i}" for i in range(10)]
+        first = self.downloader.download(urls, verbose=False)
+        self.assertTrue(all(r["status"] == "done" for r in first))
+        # identical bodies are stored once
+        self.assertEqual(len({r["path"] for r in first}), 1)
+
+        num_hits = sum(_Handler.hits.values())
+        second = self.downloader.download(urls, verbose=False)
+        self.assertTrue(all(r["status"] == "cached" for r in second))
+        self.assertEqual(sum(_Handler.hits.values()), num_hits)
+
+
+class TestDownloadManifest(_LocalServerTestCase):
+
+    def test_resume(self):
+        manifest = DownloadManifest(os.path.join(self.cache_dir, "manifest.sqlite"))
+        urls = [f"{self.base_url}/img/{i}" for i in range(6)]
+        urls += [self.base_url + "/flaky/0", self.base_url + "/missing/0"]
+        manifest.add(urls[:4])
+        counts = run_download_manifest(manifest, self.downloader, max_attempts=3, verbose=False)
+        self.assertEqual(counts, {"done": 4})
+
+        # adding URLs again keeps their state, only the new ones are fetched
+        manifest.add(urls)
+        num_hits = sum(_Handler.hits.values())
+        counts = run_download_manifest(
+            manifest, self.downloader, rate_per_host=100, max_attempts=3, verbose=False
+        )
+        self.assertEqual(counts, {"done": 7, "failed": 1})
+        # 2 new images, 3 attempts at the flaky URL, the 404 is not retried
+        self.assertEqual(sum(_Handler.hits.values()) - num_hits, 2 + 3 + 1)
+        self.assertEqual(manifest.get(self.base_url + "/flaky/0")["attempts"], 3)
+        self.assertEqual(manifest.failed(), [(self.base_url + "/missing/0", "HTTP 404")])
+        manifest.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+
+import numpy as np
+
+from mipkit.faces.faces_utils import face_align, face_align_batch
+from mipkit.faces.helpers import (
+    FACIAL_LANDMARKS_5_IDXS,
+    FACIAL_LANDMARKS_68_IDXS,
+    compute_eye_aspect_ratio,
+    compute_inter_ocular_distance,
+    compute_region_bboxes,
+    compute_region_centroids,
+    crop_landmark_regions,
+)
+
+
+def random_landmarks(num_faces, num_points, seed=0):
+    # Faces with the left eye on the right side of the image, as in `face_align`
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(80, 240, (num_faces, num_points, 2))
+    if num_points == 68:
+        landmarks[:, 36:42, 0] -= 60
+        landmarks[:, 42:48, 0] += 60
+    else:
+        landmarks[:, 0:2, 0] += 60
+        landmarks[:, 2:4, 0] -= 60
+    return landmarks
+
+
+def region_points(face, num_points, region):
+    # Points of one region of one face, looked up the way `face_align` does
+    idxs = FACIAL_LANDMARKS_68_IDXS if num_points == 68 else FACIAL_LANDMARKS_5_IDXS
+    idx = idxs[region]
+    if isinstance(idx, int):
+        return face[idx:idx + 1]
+    return face[idx[0]:idx[1]]
+
+
+class TestFaceAlignBatch(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.image = rng.integers(0, 256, (320, 320, 3), dtype=np.uint8)
+
+    def check(self, num_points, **kwargs):
+        landmarks = random_landmarks(8, num_points)
+        expected = np.stack([face_align(self.image, lm) for lm in landmarks])
+        np.testing.assert_array_equal(face_align_batch(self.image, landmarks, **kwargs), expected)
+
+    def test_68_points(self):
+        self.check(68)
+
+    def test_5_points(self):
+        self.check(5)
+
+    def test_threads_and_out_buffer(self):
+        out = np.zeros((8, 256, 256, 3), dtype=np.uint8)
+        self.check(68, num_worker=2, out=out)
+        self.assertTrue(out.any())
+
+
+class TestRegionUtilities(unittest.TestCase):
+
+    def check_regions(self, num_points):
+        landmarks = random_landmarks(8, num_points)
+        idxs = FACIAL_LANDMARKS_68_IDXS if num_points == 68 else FACIAL_LANDMARKS_5_IDXS
+        centroids = compute_region_centroids(landmarks)
+        bboxes = compute_region_bboxes(landmarks)
+        self.assertEqual(list(centroids), list(idxs))
+        self.assertEqual(list(bboxes), list(idxs))
+        for region in idxs:
+            self.assertEqual(centroids[region].shape, (8, 2))
+            self.assertEqual(bboxes[region].shape, (8, 4))
+            for i, face in enumerate(landmarks):
+                points = region_points(face, num_points, region)
+                np.testing.assert_allclose(centroids[region][i], points.mean(axis=0))
+                np.testing.assert_array_equal(
+                    bboxes[region][i], np.concatenate([points.min(axis=0), points.max(axis=0)])
+                )
+
+        expected = [
+            np.linalg.norm(
+                region_points(face, num_points, "left_eye").mean(axis=0)
+                - region_points(face, num_points, "right_eye").mean(axis=0)
+            )
+            for face in landmarks
+        ]
+        np.testing.assert_allclose(compute_inter_ocular_distance(landmarks), expected)
+
+    def test_68_points(self):
+        self.check_regions(68)
+
+    def test_5_points(self):
+        self.check_regions(5)
+
+    def test_subset_and_single_face(self):
+        landmarks = random_landmarks(3, 68)
+        centroids = compute_region_centroids(landmarks, ["nose", "mouth"])
+        self.assertEqual(list(centroids), ["nose", "mouth"])
+        single = compute_region_bboxes(landmarks[1], ["jaw"])["jaw"]
+        np.testing.assert_array_equal(single, compute_region_bboxes(landmarks)["jaw"][1:2])
+
+    def test_eye_aspect_ratio(self):
+        landmarks = random_landmarks(8, 68)
+        left, right = compute_eye_aspect_ratio(landmarks)
+        for i, face in enumerate(landmarks):
+            for ratio, region in ((left, "left_eye"), (right, "right_eye")):
+                eye = region_points(face, 68, region)
+                a = np.linalg.norm(eye[1] - eye[5])
+                b = np.linalg.norm(eye[2] - eye[4])
+                c = np.linalg.norm(eye[0] - eye[3])
+                self.assertAlmostEqual(ratio[i], (a + b) / (2.0 * c))
+        with self.assertRaises(AssertionError):
+            compute_eye_aspect_ratio(random_landmarks(2, 5))
+
+    def test_crop_landmark_regions(self):
+        image = np.random.default_rng(2).integers(0, 256, (300, 250, 3), dtype=np.uint8)
+        landmarks = random_landmarks(4, 68)
+        for margin in (0, 10, 100):
+            crops = crop_landmark_regions(image, landmarks, "mouth", margin=margin)
+            self.assertEqual(len(crops), 4)
+            for face, crop in zip(landmarks, crops):
+                points = region_points(face, 68, "mouth")
+                x, y = np.round(points.min(axis=0) - margin).astype(int)
+                xx, yy = np.round(points.max(axis=0) + margin).astype(int)
+                x, xx = np.clip([x, xx], 0, 250)
+                y, yy = np.clip([y, yy], 0, 300)
+                np.testing.assert_array_equal(crop, image[y:yy, x:xx])
+                self.assertTrue(np.shares_memory(crop, image))
+
+
+if __name__ == "__main__":
+    unittest.main()
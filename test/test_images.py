@@ -0,0 +1,229 @@
+import unittest
+
+import numpy as np
+
+from mipkit.images import (
+    batched_nms,
+    binarize_mask,
+    combine_images,
+    combine_images_grid,
+    compute_bbox_area,
+    compute_bboxes_area,
+    compute_iou_matrix,
+    convert_bboxes_format,
+    expand_box,
+    expand_bboxes,
+    gray_to_rgb,
+    match_bboxes,
+    nms,
+    padding_image,
+    soft_nms,
+    square_box,
+    square_bboxes,
+)
+
+
+def random_bboxes(num_boxes, size=200, seed=0, integer=True):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(-20, size, (num_boxes, 2))
+    wh = rng.uniform(1, size / 2, (num_boxes, 2))
+    bboxes = np.concatenate([xy, xy + wh], axis=1)
+    return np.round(bboxes).astype(np.int64) if integer else bboxes
+
+
+class TestBatchedBboxes(unittest.TestCase):
+
+    def setUp(self):
+        self.img = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    def test_area_matches_scalar(self):
+        bboxes = random_bboxes(100, integer=False)
+        expected = [compute_bbox_area(b) for b in bboxes]
+        np.testing.assert_array_equal(compute_bboxes_area(bboxes), expected)
+
+    def test_expand_matches_scalar(self):
+        for integer in (True, False):
+            bboxes = random_bboxes(100, integer=integer)
+            for ratio in (0.8, 1.0, 1.3):
+                expected = [expand_box(self.img, list(b), ratio) for b in bboxes]
+                np.testing.assert_array_equal(expand_bboxes(self.img, bboxes, ratio), expected)
+
+    def test_square_matches_scalar(self):
+        for integer in (True, False):
+            bboxes = random_bboxes(100, integer=integer)
+            expected = [square_box(self.img, list(b)) for b in bboxes]
+            np.testing.assert_array_equal(square_bboxes(self.img, bboxes), expected)
+
+    def test_convert_format_round_trip(self):
+        bboxes = random_bboxes(50, integer=False)
+        for fmt in ("coco", "cxcywh"):
+            converted = convert_bboxes_format(bboxes, "default", fmt)
+            np.testing.assert_allclose(convert_bboxes_format(converted, fmt, "default"), bboxes)
+
+
+def random_detections(num_boxes, num_classes=3, seed=0):
+    # boxes jittered around a few objects, so that many of them overlap
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 500, (num_boxes // 20, 2))
+    owner = rng.integers(0, len(centers), num_boxes)
+    cxcy = centers[owner] + rng.normal(0, 10, (num_boxes, 2))
+    wh = rng.uniform(30, 80, (num_boxes, 2))
+    bboxes = np.concatenate([cxcy - wh / 2, cxcy + wh / 2], axis=1)
+    return bboxes, rng.uniform(0, 1, num_boxes), rng.integers(0, num_classes, num_boxes)
+
+
+def nms_reference(bboxes, scores, iou_threshold):
+    iou = compute_iou_matrix(bboxes)
+    keep = []
+    for idx in np.argsort(-scores, kind="stable"):
+        if all(iou[idx, k] <= iou_threshold for k in keep):
+            keep.append(idx)
+    return keep
+
+
+class TestNMS(unittest.TestCase):
+
+    def test_nms_matches_reference(self):
+        for seed in range(20):
+            bboxes, scores, _ = random_detections(300, seed=seed)
+            for iou_threshold in (0.3, 0.5, 0.7):
+                expected = nms_reference(bboxes, scores, iou_threshold)
+                np.testing.assert_array_equal(nms(bboxes, scores, iou_threshold), expected)
+
+    def test_nms_limits(self):
+        bboxes, scores, _ = random_detections(300)
+        expected = nms_reference(bboxes, scores, 0.5)
+        np.testing.assert_array_equal(nms(bboxes, scores, max_outputs=5), expected[:5])
+        self.assertEqual(nms(bboxes, scores, max_outputs=0).shape, (0,))
+        self.assertEqual(nms(bboxes[:0], scores[:0]).shape, (0,))
+        kept = nms(bboxes, scores, score_threshold=0.5)
+        np.testing.assert_array_equal(kept, [i for i in expected if scores[i] >= 0.5])
+
+    def test_batched_nms_isolates_classes(self):
+        for seed in range(20):
+            bboxes, scores, class_ids = random_detections(300, seed=seed)
+            expected = []
+            for class_id in np.unique(class_ids):
+                members = np.flatnonzero(class_ids == class_id)
+                expected += list(members[nms_reference(bboxes[members], scores[members], 0.5)])
+            expected = sorted(expected, key=lambda i: -scores[i])
+            np.testing.assert_array_equal(batched_nms(bboxes, scores, class_ids), expected)
+
+    def test_soft_nms_hard_is_nms(self):
+        for seed in range(5):
+            bboxes, scores, _ = random_detections(300, seed=seed)
+            keep, keep_scores = soft_nms(bboxes, scores, iou_threshold=0.5, method="hard")
+            np.testing.assert_array_equal(keep, nms_reference(bboxes, scores, 0.5))
+            np.testing.assert_array_equal(keep_scores, scores[keep])
+
+    def test_soft_nms_decays_overlaps(self):
+        bboxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [50, 50, 60, 60]])
+        scores = np.array([0.9, 0.8, 0.7])
+        keep, keep_scores = soft_nms(bboxes, scores, sigma=0.5)
+        iou = 9 / 11
+        np.testing.assert_array_equal(keep, [0, 2, 1])
+        np.testing.assert_allclose(keep_scores, [0.9, 0.7, 0.8 * np.exp(-(iou**2) / 0.5)])
+
+
+class TestMatchBboxes(unittest.TestCase):
+
+    def setUp(self):
+        # greedy takes the best pair (a0, b0) and leaves a1 alone, hungarian
+        # swaps to (a0, b1) and (a1, b0) for a higher total IoU
+        self.bboxes_a = np.array([[1, 0, 11, 10], [-4, 0, 6, 10]])
+        self.bboxes_b = np.array([[0, 0, 10, 10], [4, 0, 14, 10]])
+
+    def test_greedy(self):
+        matches, unmatched_a, unmatched_b = match_bboxes(
+            self.bboxes_a, self.bboxes_b, iou_threshold=0.4
+        )
+        np.testing.assert_array_equal(matches, [[0, 0]])
+        np.testing.assert_array_equal(unmatched_a, [1])
+        np.testing.assert_array_equal(unmatched_b, [1])
+
+    def test_hungarian(self):
+        matches, unmatched_a, unmatched_b = match_bboxes(
+            self.bboxes_a, self.bboxes_b, iou_threshold=0.4, method="hungarian"
+        )
+        np.testing.assert_array_equal(matches, [[0, 1], [1, 0]])
+        self.assertEqual(len(unmatched_a), 0)
+        self.assertEqual(len(unmatched_b), 0)
+
+    def test_threshold(self):
+        for method in ("greedy", "hungarian"):
+            matches, unmatched_a, unmatched_b = match_bboxes(
+                self.bboxes_a, self.bboxes_b, iou_threshold=0.9, method=method
+            )
+            self.assertEqual(matches.shape, (0, 2))
+            np.testing.assert_array_equal(unmatched_a, [0, 1])
+            np.testing.assert_array_equal(unmatched_b, [0, 1])
+
+
+def random_images(shapes, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(1, 256, shape, dtype=np.uint8) for shape in shapes]
+
+
+class TestOutVariants(unittest.TestCase):
+
+    def assert_out_matches(self, func, *args, **kwargs):
+        expected = func(*args, **kwargs)
+        out = np.full_like(expected, 7)
+        result = func(*args, out=out, **kwargs)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, expected)
+        return expected
+
+    def test_binarize_mask(self):
+        mask = np.random.default_rng(0).random((20, 30))
+        expected = self.assert_out_matches(binarize_mask, mask, 0.3)
+        self.assertEqual(expected.dtype, np.uint8)
+        np.testing.assert_array_equal(expected, mask >= 0.3)
+        # in place
+        binarize_mask(mask, 0.3, out=mask)
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_gray_to_rgb(self):
+        gray = random_images([(20, 30)])[0]
+        expected = self.assert_out_matches(gray_to_rgb, gray)
+        self.assertEqual(expected.shape, (20, 30, 3))
+        for channel in range(3):
+            np.testing.assert_array_equal(expected[..., channel], gray)
+        np.testing.assert_array_equal(gray_to_rgb(gray[..., None]), expected)
+
+    def test_combine_images(self):
+        images = random_images([(10, 20, 3), (15, 5, 3), (8, 8, 3)])
+        horizontal = self.assert_out_matches(combine_images, images, axis=1)
+        vertical = self.assert_out_matches(combine_images, images, axis=0)
+        self.assertEqual(horizontal.shape, (15, 33, 3))
+        self.assertEqual(vertical.shape, (33, 20, 3))
+        np.testing.assert_array_equal(horizontal[:15, 20:25], images[1])
+        self.assertEqual(horizontal[10:, :20].sum(), 0)
+        np.testing.assert_array_equal(vertical[25:, :8], images[2])
+        self.assertEqual(vertical[25:, 8:].sum(), 0)
+
+    def test_combine_images_grid(self):
+        images = random_images([(10, 20, 3), (15, 5, 3), (8, 8, 3)])
+        grid = self.assert_out_matches(combine_images_grid, images, ncols=2)
+        self.assertEqual(grid.shape, (23, 25, 3))
+        np.testing.assert_array_equal(grid[:15, 20:], images[1])
+        np.testing.assert_array_equal(grid[15:, :8], images[2])
+        self.assertEqual(grid[15:, 8:].sum(), 0)
+
+    def test_padding_image(self):
+        for shape in [(20, 30, 3), (30, 20, 3), (24, 24, 3)]:
+            img = random_images([shape])[0]
+            expected = self.assert_out_matches(padding_image, img)
+            if shape[0] == shape[1]:
+                np.testing.assert_array_equal(expected, img)
+
+    def test_padding_image_rejects_bad_out(self):
+        img = random_images([(20, 30, 3)])[0]
+        with self.assertRaises(AssertionError):
+            padding_image(img, out=np.empty((20, 30, 3), dtype=np.uint8))
+        with self.assertRaises(AssertionError):
+            padding_image(img, out=np.empty((30, 50, 3), dtype=np.float32))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from mipkit import logger as mlogger
+from mipkit.mprocess import pool_worker
+
+
+def log_item(n):
+    logging.getLogger("test.worker").warning("item %d", n)
+    mlogger.print_info("printed", n)
+    return os.getpid()
+
+
+class TestAsyncLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.tmp_dir, "log.txt")
+
+    def tearDown(self):
+        mlogger.stop_async_logging()
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_lines(self):
+        mlogger.stop_async_logging()
+        with open(self.log_file) as f:
+            return f.read().splitlines()
+
+    def test_handlers_idempotent(self):
+        named = mlogger.get_logger("test.named")
+        mlogger.get_logger("test.named")
+        self.assertEqual(len(named.handlers), 1)
+
+        for _ in range(2):
+            mlogger.setup_async_logging(self.log_file, stream=False)
+        root_handlers = [h for h in logging.getLogger().handlers if mlogger._is_mipkit_handler(h)]
+        self.assertEqual(len(root_handlers), 1)
+        # the named logger now only reaches the queue, so its records are written once
+        self.assertEqual(named.handlers, [])
+        mlogger.get_logger("test.named").info("once")
+        self.assertEqual(named.handlers, [])
+        self.assertEqual(len([line for line in self._read_lines() if "once" in line]), 1)
+
+    def test_json_output(self):
+        mlogger.setup_async_logging(self.log_file, json_format=True, stream=False)
+        logging.getLogger("test.json").info("loss %.1f", 0.5, extra={"data": {"step": 3}})
+        mlogger.print_warning("careful", 1)
+        records = [json.loads(line) for line in self._read_lines()]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["message"], "loss 0.5")
+        self.assertEqual(records[0]["step"], 3)
+        self.assertEqual(records[0]["name"], "test.json")
+        self.assertEqual(records[1]["message"], "careful 1")
+        self.assertEqual(records[1]["levelname"], "WARNING")
+        # print_* report their caller
+        self.assertEqual(records[1]["module"], "test_logger")
+
+    def test_pool_worker_children_reach_log_file(self):
+        mlogger.setup_async_logging(self.log_file, stream=False, multiprocess=True)
+        pids = pool_worker(log_item, [1, 2, 3], num_worker=2, verbose=False)
+        logging.getLogger("test.parent").warning("parent")
+        lines = self._read_lines()
+        for n in (1, 2, 3):
+            self.assertEqual(sum(line.endswith(f"item {n}") for line in lines), 1)
+            self.assertEqual(sum(line.endswith(f"printed {n}") for line in lines), 1)
+        self.assertTrue(any(line.endswith("parent") for line in lines))
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_forked_child_drops_in_process_queue(self):
+        mlogger.setup_async_logging(self.log_file, stream=False)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            handler_gone = mlogger._QUEUE_HANDLER is None and mlogger._LISTENER is None
+            os.write(write_fd, b"1" if handler_gone else b"0")
+            os._exit(0)
+        os.close(write_fd)
+        self.assertEqual(os.read(read_fd, 1), b"1")
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        self.assertIsNotNone(mlogger._QUEUE_HANDLER)
+
+
+if __name__ == "__main__":
+    unittest.main()
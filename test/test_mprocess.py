@@ -0,0 +1,38 @@
+import time
+import unittest
+
+from mipkit.mprocess import pool_worker
+
+
+def busy(n):
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.02:
+        pass
+    return n * n
+
+
+class TestPoolWorkerProfile(unittest.TestCase):
+
+    def test_results_in_order(self):
+        for use_thread in (False, True):
+            res, report = pool_worker(
+                busy,
+                list(range(6)),
+                use_thread=use_thread,
+                num_worker=2,
+                verbose=False,
+                profile="sample",
+            )
+            self.assertEqual(res, [n * n for n in range(6)])
+            self.assertEqual(len(report.records), 6)
+
+    def test_sampling_after_fork(self):
+        # a sampler started in the parent must not be reused by forked workers
+        pool_worker(busy, [1, 2], num_worker=1, verbose=False, profile="sample")
+        _, report = pool_worker(busy, list(range(4)), num_worker=2, verbose=False, profile="sample")
+        self.assertGreater(sum(report.stacks.values()), 0)
+        self.assertIn("test_mprocess.py:busy", report.collapsed_stacks())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+from mipkit import pdf
+
+
+def write_pdf(path, num_pages=2):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = PdfFileWriter()
+    for _ in range(num_pages):
+        writer.addBlankPage(200, 300)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+class TestExpandMargins(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.inputs = [os.path.join(self.tmp_dir, d, "x.pdf") for d in ("a", "b")]
+        for i, path in enumerate(self.inputs):
+            write_pdf(path, num_pages=i + 1)
+        self.output_dir = os.path.join(self.tmp_dir, "out")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_file_names_keep_their_folders(self):
+        results = pdf.expand_margins(
+            self.inputs, output_dir=self.output_dir, num_worker=1, verbose=False
+        )
+        self.assertEqual([r["error"] for r in results], [None, None])
+        for i, folder in enumerate(("a", "b")):
+            output = os.path.join(self.output_dir, folder, "x.pdf")
+            self.assertEqual(results[i]["output"], output)
+            with open(output, "rb") as f:
+                reader = PdfFileReader(f)
+                self.assertEqual(reader.getNumPages(), i + 1)
+                self.assertEqual(float(reader.getPage(0).mediaBox.getWidth()), 400)
+
+    def test_duplicate_outputs_rejected(self):
+        with self.assertRaises(ValueError):
+            pdf.expand_margins(self.inputs[:1] * 2, output_dir=self.output_dir, verbose=False)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "a", "x.pdf")))
+
+    def test_failed_write_removes_tmp_file(self):
+        output = os.path.join(self.tmp_dir, "failed.pdf")
+        with mock.patch.object(pdf.PdfFileWriter, "write", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                pdf.expand_margin(self.inputs[0], output, verbose=False)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["a", "b"])
+
+    def test_main_skips_missing_paths(self):
+        missing = os.path.join(self.tmp_dir, "missing.pdf")
+        argv = ["pdf", "-q", "-j", "1", "-o", self.output_dir, "-p", missing, *self.inputs]
+        with mock.patch("sys.argv", argv), mock.patch("sys.stderr"):
+            with self.assertRaises(SystemExit) as ctx:
+                pdf.main()
+        self.assertEqual(ctx.exception.code, 1)
+        for folder in ("a", "b"):
+            self.assertTrue(os.path.isfile(os.path.join(self.output_dir, folder, "x.pdf")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import csv
+import io
+import itertools
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from mipkit.profiling import PROMETHEUS_BUCKETS, LatencyHistogram, Profiler
+
+
+def fake_clock(step_ns):
+    # every perf_counter_ns() call advances by `step_ns`
+    return mock.patch("time.perf_counter_ns", side_effect=itertools.count(0, step_ns))
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_quantile_relative_error(self):
+        values = np.random.default_rng(0).lognormal(12, 2, 20000).astype(np.int64) + 1
+        hist = LatencyHistogram()
+        for value in values.tolist():
+            hist.add(value)
+        self.assertEqual(hist.count, len(values))
+        for q in (0.0, 0.1, 0.5, 0.9, 0.99, 1.0):
+            expected = np.quantile(values, q, method="lower")
+            self.assertLess(abs(hist.quantile(q) - expected) / expected, 2**-4, f"q={q}")
+
+    def test_small_values_are_exact(self):
+        hist = LatencyHistogram()
+        for value in range(32):
+            hist.add(value)
+        self.assertEqual([hist.quantile(q) for q in (0, 1)], [0, 31])
+
+    def test_merge(self):
+        first, second, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for i, value in enumerate(range(1, 100000, 37)):
+            (first if i % 2 else second).add(value)
+            both.add(value)
+        first.merge(second)
+        self.assertEqual(first.counts, both.counts)
+        self.assertEqual(first.count, both.count)
+        self.assertIsNone(LatencyHistogram().quantile(0.5))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_sampling_under_threads(self):
+        profiler = Profiler(sample_rate=0.1)
+
+        @profiler.profile("work")
+        def work():
+            pass
+
+        def run():
+            for _ in range(2000):
+                work()
+                with profiler.measure("block"):
+                    pass
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        # switch threads as often as possible to expose unsynchronized counters
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        summary = profiler.to_dict()
+        for name in ("work", "block"):
+            self.assertEqual(summary[name]["calls"], 16000)
+            self.assertEqual(summary[name]["sampled"], 1600)
+
+    def test_summary(self):
+        profiler = Profiler(cpu_time=True)
+
+        # the decorator looks the clock up once, when applied
+        with fake_clock(2_000_000):
+
+            @profiler.profile()
+            def work(x):
+                return x + 1
+
+            self.assertEqual([work(i) for i in range(10)], list(range(1, 11)))
+        summary = profiler.to_dict()
+        name = work.__qualname__
+        self.assertEqual(summary[name]["calls"], 10)
+        self.assertEqual(summary[name]["mean_ms"], 2.0)
+        self.assertEqual(summary[name]["max_ms"], 2.0)
+        self.assertAlmostEqual(summary[name]["p50_ms"], 2.0, delta=2.0 * 2**-4)
+        self.assertIn("cpu_mean_ms", summary[name])
+        self.assertIn(name[:39], profiler.report())
+
+        profiler.reset()
+        self.assertEqual(profiler.to_dict(), {})
+        work(0)
+        self.assertEqual(profiler.to_dict()[name]["calls"], 1)
+
+    def test_exceptions_are_timed(self):
+        profiler = Profiler()
+        with self.assertRaises(ValueError):
+            with profiler.measure("fails"):
+                raise ValueError()
+        self.assertEqual(profiler.to_dict()["fails"]["sampled"], 1)
+
+    def test_csv(self):
+        profiler = Profiler()
+        with fake_clock(1_000_000):
+            for name in ("a", "b", "a"):
+                with profiler.measure(name):
+                    pass
+        rows = list(csv.DictReader(io.StringIO(profiler.to_csv())))
+        self.assertEqual([row["name"] for row in rows], ["a", "b"])
+        self.assertEqual([int(row["calls"]) for row in rows], [2, 1])
+        self.assertEqual(float(rows[0]["total_ms"]), 2.0)
+
+    def test_prometheus(self):
+        profiler = Profiler()
+        with fake_clock(2_000_000):
+            for _ in range(3):
+                with profiler.measure('say "hi"'):
+                    pass
+        lines = profiler.to_prometheus("latency").splitlines()
+        self.assertEqual(lines[1], "# TYPE latency histogram")
+        buckets = [line for line in lines if line.startswith("latency_bucket")]
+        self.assertEqual(len(buckets), len(PROMETHEUS_BUCKETS) + 1)
+        self.assertTrue(all('name="say \\"hi\\""' in line for line in buckets))
+        counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+        # 2ms durations: only in the 0.01s bucket and above
+        self.assertEqual(counts, [0, 0, 0, 0, 3, 3, 3, 3, 3])
+        self.assertIn('latency_sum{name="say \\"hi\\""} 0.006000000', lines)
+        self.assertIn('latency_count{name="say \\"hi\\""} 3', lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
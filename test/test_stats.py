@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from mipkit.stats import (
+    ImageDatasetStats,
+    RunningStats,
+    TDigest,
+    compute_image_dataset_stats,
+    compute_stats,
+    show_stats,
+)
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = np.concatenate([rng.normal(5, 2, 50000), rng.exponential(3, 50000)])
+        rng.shuffle(self.values)
+
+    def test_merge_is_exact(self):
+        chunks = np.array_split(self.values, [1, 10, 3000, 3001, 40000, 77777])
+        partials = [RunningStats().update(chunk) for chunk in chunks]
+        merged = RunningStats()
+        for partial in partials:
+            merged.merge(partial)
+        streamed = RunningStats()
+        for chunk in chunks:
+            streamed.update(chunk)
+
+        for stats in (merged, streamed):
+            self.assertEqual(stats.count, len(self.values))
+            self.assertAlmostEqual(stats.mean, np.mean(self.values), places=10)
+            self.assertAlmostEqual(stats.var, np.var(self.values), places=8)
+            self.assertEqual(stats.min, self.values.min())
+            self.assertEqual(stats.max, self.values.max())
+
+    def test_quantile_error_is_bounded(self):
+        stats = RunningStats()
+        for chunk in np.array_split(self.values, 37):
+            stats.update(chunk)
+        sorted_values = np.sort(self.values)
+        for q in (0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999):
+            # error measured in rank, which does not depend on the scale of the data
+            rank = np.searchsorted(sorted_values, stats.quantile(q)) / len(self.values)
+            self.assertLess(abs(rank - q), 0.001, f"q={q}")
+            if 0.01 <= q <= 0.99:
+                error = abs(stats.quantile(q) - np.quantile(self.values, q))
+                self.assertLess(error, 0.05, f"q={q}")
+        self.assertEqual(stats.quantile(0), self.values.min())
+        self.assertEqual(stats.quantile(1), self.values.max())
+
+    def test_non_finite_values_are_counted(self):
+        values = np.array([1.0, np.nan, 3.0, np.inf, -np.inf, np.nan])
+        stats = RunningStats().update(values)
+        self.assertEqual((stats.count, stats.num_nan, stats.num_inf), (2, 2, 2))
+        self.assertEqual((stats.mean, stats.min, stats.max), (2.0, 1.0, 3.0))
+
+    def test_integer_values(self):
+        values = np.arange(1000, dtype=np.uint8)
+        stats = RunningStats().update(values)
+        self.assertAlmostEqual(stats.mean, values.mean())
+        self.assertAlmostEqual(stats.var, values.var())
+
+
+class TestTDigest(unittest.TestCase):
+
+    def test_merge_keeps_count_and_size(self):
+        rng = np.random.default_rng(1)
+        digests = [TDigest(delta=100).update(rng.uniform(0, 1, 10000)) for _ in range(8)]
+        merged = TDigest(delta=100)
+        for digest in digests:
+            merged.merge(digest)
+        self.assertEqual(merged.count, 80000)
+        self.assertLessEqual(len(merged.means), 110)
+        self.assertAlmostEqual(float(merged.quantile(0.5)), 0.5, delta=0.01)
+
+    def test_empty(self):
+        self.assertTrue(np.isnan(TDigest().quantile(0.5)))
+
+
+class TestComputeStats(unittest.TestCase):
+
+    def test_chunks_and_workers(self):
+        values = np.random.default_rng(2).normal(0, 1, (1000, 37)).astype(np.float32)
+        for num_worker in (1, 3):
+            stats = compute_stats(values, chunk_size=1000, num_worker=num_worker)
+            self.assertEqual(stats.count, values.size)
+            self.assertAlmostEqual(stats.mean, values.mean(dtype=np.float64), places=10)
+            self.assertAlmostEqual(stats.var, values.var(dtype=np.float64), places=8)
+
+    def test_memmap(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            values = np.memmap(os.path.join(tmp_dir, "values.bin"), np.float64, "w+", shape=(5000,))
+            values[:] = np.arange(5000)
+            stats = compute_stats(values, chunk_size=512)
+            self.assertEqual((stats.min, stats.max, stats.mean), (0, 4999, 2499.5))
+            del values
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_show_stats_paths_agree(self):
+        for values in (np.array([1.0, np.nan, 3.0]), np.arange(11, dtype=np.float64)):
+            expected = show_stats(values, return_stats=True, verbose=False)
+            streamed = show_stats(values, return_stats=True, verbose=False, streaming=True)
+            for key in ("mean", "max", "min", "median"):
+                np.testing.assert_allclose(streamed[key], expected[key], err_msg=key)
+        self.assertEqual(streamed["num_nan"], 0)
+
+
+class TestImageDatasetStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.images = [
+            rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+            for h, w in [(20, 30), (20, 30), (15, 40), (50, 10)]
+        ]
+        pixels = np.concatenate([img.reshape(-1, 3) for img in self.images])
+        self.mean = pixels.mean(axis=0)
+        self.std = pixels.std(axis=0)
+
+    def test_mean_std_and_merge(self):
+        first = ImageDatasetStats()
+        second = ImageDatasetStats()
+        for img in self.images[:1]:
+            first.update(img)
+        for img in self.images[1:]:
+            second.update(img)
+        stats = first.merge(second)
+        np.testing.assert_allclose(stats.mean, self.mean)
+        np.testing.assert_allclose(stats.std, self.std)
+        summary = stats.to_dict()
+        self.assertEqual(summary["num_images"], 4)
+        self.assertEqual(summary["most_common_sizes"][0], ((20, 30), 2))
+        self.assertEqual(summary["height"], {"min": 15, "max": 50, "mean": 26.25})
+
+    def test_compute_from_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i, img in enumerate(self.images):
+                paths.append(os.path.join(tmp_dir, f"{i}.png"))
+                cv2.imwrite(paths[-1], img)
+            paths.append(os.path.join(tmp_dir, "missing.png"))
+            stats = compute_image_dataset_stats(paths, num_worker=2, shard_size=2, verbose=False)
+        finally:
+            shutil.rmtree(tmp_dir)
+        # images are read back as RGB
+        np.testing.assert_allclose(stats.mean, self.mean[::-1])
+        np.testing.assert_allclose(stats.std, self.std[::-1])
+        self.assertEqual(stats.num_images, 4)
+        self.assertEqual([path for path, _ in stats.failures], paths[-1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
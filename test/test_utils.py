@@ -0,0 +1,168 @@
+import argparse
+import copy
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from mipkit.utils import (
+    FrozenConfig,
+    clear_config_cache,
+    load_config,
+    load_yaml_config,
+    parse_literal,
+    to_categorical,
+)
+
+
+def dense_reference(y, num_classes, dtype="float32"):
+    y = np.asarray(y, dtype="int").ravel()
+    expected = np.zeros((len(y), num_classes), dtype=dtype)
+    expected[np.arange(len(y)), y] = 1
+    return expected
+
+
+class TestToCategorical(unittest.TestCase):
+
+    def setUp(self):
+        self.y = np.random.default_rng(0).integers(0, 30, (6, 5, 1))
+        self.expected = dense_reference(self.y, 30)
+
+    def test_dense(self):
+        out = to_categorical(self.y, 30)
+        self.assertEqual(out.shape, (6, 5, 30))
+        self.assertEqual(out.dtype, np.float32)
+        np.testing.assert_array_equal(out.reshape(-1, 30), self.expected)
+        np.testing.assert_array_equal(to_categorical([2.0, 0.0]), [[0, 0, 1], [1, 0, 0]])
+
+    def test_dtype(self):
+        for dtype in ("uint8", "bool"):
+            out = to_categorical(self.y, 30, dtype=dtype)
+            self.assertEqual(out.dtype, np.dtype(dtype))
+            np.testing.assert_array_equal(out.reshape(-1, 30), self.expected.astype(dtype))
+
+    def test_out_buffer(self):
+        out = np.full((6, 5, 30), 7, dtype=np.uint8)
+        self.assertIs(to_categorical(self.y, 30, dtype="uint8", out=out), out)
+        np.testing.assert_array_equal(out.reshape(-1, 30), self.expected)
+
+    def test_sparse(self):
+        out = to_categorical(self.y, 30, sparse=True)
+        self.assertEqual(out.shape, (30, 30))
+        self.assertEqual(out.dtype, np.float32)
+        np.testing.assert_array_equal(out.toarray(), self.expected)
+
+    def test_chunks(self):
+        chunks = list(to_categorical(self.y, 30, chunk_size=7))
+        self.assertEqual([len(c) for c in chunks], [7, 7, 7, 7, 2])
+        np.testing.assert_array_equal(np.concatenate(chunks), self.expected)
+
+    def test_negative_labels_rejected(self):
+        for kwargs in ({}, {"sparse": True}, {"chunk_size": 2}):
+            with self.assertRaises(AssertionError):
+                to_categorical([0, -1, 2], 3, **kwargs)
+
+
+CONFIG = """
+model:
+  name: resnet
+  lr: "1e-3"
+  layers: [64, "128", {size: 256}]
+  shape: "(224, 224)"
+seed: 0
+"""
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "config.yaml")
+        with open(self.path, "w") as f:
+            f.write(CONFIG)
+        clear_config_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        clear_config_cache()
+
+    def test_load(self):
+        config = load_config(self.path)
+        self.assertEqual(config.model.lr, 1e-3)
+        self.assertEqual(config["model"]["layers"][1], 128)
+        self.assertEqual(config.model.layers[2].size, 256)
+        self.assertEqual(config.seed, 0)
+        self.assertEqual(load_config(self.path, parse_literals=False).model.lr, "1e-3")
+        with self.assertRaises(AttributeError):
+            config.missing
+
+    def test_json(self):
+        path = os.path.join(self.tmp_dir, "config.json")
+        with open(path, "w") as f:
+            f.write('{"a": {"b": [1, "2"]}}')
+        self.assertEqual(load_config(path).todict(), {"a": {"b": [1, 2]}})
+
+    def test_cache_hit_and_invalidation(self):
+        config = load_config(self.path)
+        self.assertIs(load_config(self.path), config)
+        self.assertIsNot(load_config(self.path, use_cache=False), config)
+
+        # same size, only the modification time changes
+        with open(self.path, "w") as f:
+            f.write(CONFIG.replace("seed: 0", "seed: 1"))
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = load_config(self.path)
+        self.assertIsNot(reloaded, config)
+        self.assertEqual(reloaded.seed, 1)
+        self.assertIs(load_config(self.path), reloaded)
+
+    def test_mutation_rejected(self):
+        config = load_config(self.path)
+        with self.assertRaises(TypeError):
+            config.seed = 1
+        with self.assertRaises(TypeError):
+            config["seed"] = 1
+        with self.assertRaises(TypeError):
+            config.model.name = "vgg"
+        with self.assertRaises(AttributeError):
+            config.model.layers.append(1)
+
+        copied = config.todict()
+        copied["model"]["layers"].append(1)
+        self.assertEqual(len(load_config(self.path).model.layers), 3)
+
+    def test_todict_keeps_types(self):
+        config = load_config(self.path)
+        data = config.todict()
+        self.assertEqual(data["model"]["layers"], [64, 128, {"size": 256}])
+        self.assertEqual(data["model"]["shape"], (224, 224))
+        self.assertEqual(FrozenConfig({"a": (1, [2])}).todict(), {"a": (1, [2])})
+        for clone in (pickle.loads(pickle.dumps(config)), copy.deepcopy(config)):
+            self.assertEqual(clone.todict(), data)
+
+    def test_parse_literal_does_not_eval(self):
+        marker = os.path.join(self.tmp_dir, "executed")
+        code = f"open({marker!r}, 'w')"
+        for value in (code, f"__import__('os').remove({self.path!r})", "2**10", "lambda: 0"):
+            self.assertEqual(parse_literal(value), value)
+        self.assertFalse(os.path.exists(marker))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(parse_literal("[1, {'a': None}]"), [1, {"a": None}])
+        self.assertEqual(parse_literal("-1.5e3"), -1500.0)
+        self.assertEqual(parse_literal("resnet"), "resnet")
+
+    def test_load_yaml_config(self):
+        args = load_yaml_config(self.path, verbose=False)
+        self.assertIsInstance(args, argparse.Namespace)
+        self.assertEqual(args.model.lr, 1e-3)
+        data = load_yaml_config(self.path, to_dict=True, verbose=False)
+        data["seed"] = 5
+        self.assertEqual(load_yaml_config(self.path, to_dict=True, verbose=False)["seed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
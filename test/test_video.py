@@ -0,0 +1,238 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import write_video
+from mipkit.video import (
+    VideoMetadataIndex,
+    decode_video_parallel,
+    get_frames_by_FPS,
+    iter_frame_batches,
+    iter_frames,
+    iter_frames_by_FPS,
+    iter_frames_by_indexes,
+    iter_scene_changes,
+)
+
+
+def frame_mean(frame):
+    # Top-level so that worker processes can pickle it
+    return frame.mean(axis=(0, 1))
+
+
+def read_all(video_file):
+    cap = cv2.VideoCapture(video_file)
+    frames = []
+    while True:
+        has_frame, frame = cap.read()
+        if not has_frame:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+class _VideoTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.video_file = write_video(os.path.join(cls.tmp_dir, "video.avi"), num_frames=90)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def setUp(self):
+        self.cap = cv2.VideoCapture(self.video_file)
+
+    def tearDown(self):
+        self.cap.release()
+
+
+class TestFrameSampling(_VideoTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.frames = read_all(cls.video_file)
+        cls.rgb_frames = [cv2.cvtColor(f, cv2.COLOR_BGR2RGB) for f in cls.frames]
+
+    def assert_frames_equal(self, items, indexes):
+        items = list(items)
+        self.assertEqual([idx for idx, _ in items], list(indexes))
+        for idx, frame in items:
+            np.testing.assert_array_equal(frame, self.rgb_frames[idx])
+
+    def test_by_indexes(self):
+        indexes = [0, 1, 5, 40, 41, 89]
+        for seek_threshold in (0, 3, 150):
+            cap = cv2.VideoCapture(self.video_file)
+            items = iter_frames_by_indexes(cap, indexes, seek_threshold=seek_threshold)
+            self.assert_frames_equal(items, indexes)
+            cap.release()
+
+    def test_by_fps(self):
+        # 7 frames per second of a 30 fps video: one frame every 30 / 7 frames
+        expected = [round(i * 30 / 7) for i in range(21)]
+        self.assert_frames_equal(iter_frames_by_FPS(self.cap, target_fps=7), expected)
+
+    def test_by_stride(self):
+        frames = get_frames_by_FPS(self.cap, fps=5)
+        self.assertEqual(len(frames), 18)
+        for i, frame in enumerate(frames):
+            np.testing.assert_array_equal(frame, self.rgb_frames[5 * i])
+
+
+class TestStreaming(_VideoTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.resized = [
+            cv2.cvtColor(cv2.resize(f, (64, 48), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+            for f in read_all(cls.video_file)
+        ]
+
+    def test_iter_frames(self):
+        for prefetch in (0, 2):
+            cap = cv2.VideoCapture(self.video_file)
+            items = list(iter_frames(cap, size=(64, 48), prefetch=prefetch))
+            cap.release()
+            self.assertEqual([idx for idx, _ in items], list(range(90)))
+            np.testing.assert_array_equal(np.stack([f for _, f in items]), self.resized)
+
+    def test_iter_frame_batches(self):
+        for prefetch in (0, 1, 3):
+            cap = cv2.VideoCapture(self.video_file)
+            batches = [
+                (indexes, batch.copy())
+                for indexes, batch in iter_frame_batches(
+                    cap, batch_size=16, size=(64, 48), prefetch=prefetch
+                )
+            ]
+            cap.release()
+            self.assertEqual([len(indexes) for indexes, _ in batches], [16] * 5 + [10])
+            np.testing.assert_array_equal(np.concatenate([i for i, _ in batches]), range(90))
+            np.testing.assert_array_equal(np.concatenate([b for _, b in batches]), self.resized)
+
+    def test_iter_frame_batches_subset(self):
+        indexes = list(range(0, 90, 7))
+        batches = list(
+            iter_frame_batches(self.cap, batch_size=4, frame_indexes=indexes, to_rgb=False)
+        )
+        np.testing.assert_array_equal(np.concatenate([i for i, _ in batches]), indexes)
+        frames = read_all(self.video_file)
+        np.testing.assert_array_equal(batches[-1][1], [frames[i] for i in indexes[-1:]])
+
+
+class TestDecodeParallel(_VideoTestCase):
+
+    def test_order(self):
+        frames = read_all(self.video_file)
+        items = decode_video_parallel(self.video_file, num_segments=5, num_worker=2, to_rgb=False)
+        self.assertEqual([idx for idx, _ in items], list(range(90)))
+        np.testing.assert_array_equal(np.stack([f for _, f in items]), frames)
+
+    def test_subset_and_func(self):
+        frames = read_all(self.video_file)
+        indexes = [3, 10, 11, 50, 88]
+        items = decode_video_parallel(
+            self.video_file, indexes, num_worker=2, to_rgb=False, func=frame_mean
+        )
+        self.assertEqual([idx for idx, _ in items], indexes)
+        for idx, value in items:
+            np.testing.assert_allclose(value, frames[idx].mean(axis=(0, 1)))
+
+
+class TestSceneChanges(unittest.TestCase):
+
+    def setUp(self):
+        # three 30-frame shots of flat colors
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_file = os.path.join(self.tmp_dir, "shots.avi")
+        writer = cv2.VideoWriter(self.video_file, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+        for value in (0, 255, 128):
+            for _ in range(30):
+                writer.write(np.full((48, 64, 3), value, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def scene_changes(self, **kwargs):
+        cap = cv2.VideoCapture(self.video_file)
+        indexes = [idx for idx, _ in iter_scene_changes(cap, **kwargs)]
+        cap.release()
+        return indexes
+
+    def test_cuts(self):
+        self.assertEqual(self.scene_changes(), [0, 30, 60])
+        self.assertEqual(self.scene_changes(stride=4), [0, 32, 60])
+        self.assertEqual(self.scene_changes(min_interval=40), [0, 40, 80])
+
+
+class TestVideoMetadataIndex(_VideoTestCase):
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.video_files = []
+        for i in range(2):
+            path = os.path.join(self.index_dir, f"{i}.avi")
+            shutil.copy(self.video_file, path)
+            self.video_files.append(path)
+        self.thumbnail_dir = os.path.join(self.index_dir, "thumbnails")
+        self.index = VideoMetadataIndex(
+            os.path.join(self.index_dir, "index.sqlite"), thumbnail_dir=self.thumbnail_dir
+        )
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.index_dir)
+
+    def test_scan(self):
+        records = self.index.scan(self.video_files, verbose=False)
+        self.assertEqual([r["path"] for r in records], self.video_files)
+        for r in records:
+            self.assertEqual((r["width"], r["height"], r["num_frames"]), (320, 240, 90))
+            self.assertTrue(os.path.isfile(r["thumbnail"]))
+        self.assertEqual(self.index.get(self.video_files[0]), records[0])
+
+    def test_refresh_on_mtime_change(self):
+        first = self.index.scan(self.video_files, verbose=False)
+        mtime = first[0]["mtime"] + 10
+        os.utime(self.video_files[0], (mtime, mtime))
+        self.assertIsNone(self.index.get(self.video_files[0]))
+
+        second = self.index.scan(self.video_files, verbose=False)
+        self.assertEqual(second[0]["mtime"], mtime)
+        self.assertEqual(second[1], first[1])
+        # the thumbnail of the outdated entry is replaced
+        self.assertNotEqual(second[0]["thumbnail"], first[0]["thumbnail"])
+        self.assertFalse(os.path.exists(first[0]["thumbnail"]))
+        self.assertEqual(self.index.get(self.video_files[0]), second[0])
+
+    def test_get_deleted_file(self):
+        self.index.scan(self.video_files, verbose=False)
+        os.remove(self.video_files[0])
+        self.assertIsNone(self.index.get(self.video_files[0]))
+        self.assertIsNone(self.index.get(os.path.join(self.index_dir, "unknown.avi")))
+
+    def test_failed_thumbnail_not_rescanned(self):
+        shutil.rmtree(self.thumbnail_dir)
+        first = self.index.scan(self.video_files, verbose=False)
+        self.assertEqual([r["thumbnail"] for r in first], ["", ""])
+        self.assertEqual(self.index.get(self.video_files[0]), first[0])
+
+        os.makedirs(self.thumbnail_dir)
+        second = self.index.scan(self.video_files, verbose=False)
+        self.assertEqual(second, first)
+        self.assertEqual(os.listdir(self.thumbnail_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()